@@ -0,0 +1,73 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from pool import ModemPool
+from scheduler import PRIORITY_MAINTENANCE, PRIORITY_POLL, PRIORITY_SEND
+from sms import ATResponse, SMSHandler
+
+
+class AsyncSMSHandler:
+    """
+    Awaitable front end for SMSHandler, for use from async FastAPI endpoints.
+
+    Serial reads already happen on SMSHandler's reader thread and responses are
+    signalled as soon as the final result code arrives, so nothing here polls or
+    sleeps. Ordering is up to each modem's CommandScheduler (sends before polls
+    before maintenance), so calls are not serialized here: with a single
+    SMSHandler they are submitted to its scheduler and awaited as futures (a
+    waiting HTTP request costs a coroutine, and cancelling it drops the job if it
+    has not started); a ModemPool's calls run on a small thread pool.
+
+    With a ModemPool the receive and maintenance calls cover every modem;
+    command() and read_message() need a single SMSHandler.
+    """
+
+    def __init__(self, handler: Union[SMSHandler, ModemPool]):
+        self.handler = handler
+        workers = 4 * (len(handler) if isinstance(handler, ModemPool) else 1)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sms-async")
+
+    async def _run(self, priority: int, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if isinstance(self.handler, SMSHandler):
+            future = self.handler.scheduler.submit(fn, *args, priority=priority, **kwargs)
+            return await asyncio.wrap_future(future)
+        return await self._offload(fn, *args, **kwargs)
+
+    async def _offload(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        # For calls that schedule several jobs themselves (and every ModemPool call)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    # ---------- COMMAND API ----------
+
+    async def command(self, command: str, timeout: float = 2.0, expect_prompt: bool = False) -> ATResponse:
+        """
+        Send a raw AT command and await its structured response.
+        """
+        return await self._run(
+            PRIORITY_SEND, self.handler._send_at_command, command, timeout=timeout, expect_prompt=expect_prompt
+        )
+
+    # ---------- PUBLIC API ----------
+
+    async def send_sms(self, phone_number: str, message: str) -> Dict[str, Any]:
+        return await self._run(PRIORITY_SEND, self.handler.send_sms, phone_number, message)
+
+    async def read_sms(self, include_read: bool = False) -> List[dict]:
+        return await self._run(PRIORITY_POLL, self.handler.read_sms, include_read)
+
+    async def read_message(self, index: int) -> Optional[dict]:
+        return await self._run(PRIORITY_POLL, self.handler.read_message, index)
+
+    async def clear_sms_storage(self) -> Dict[str, Any]:
+        return await self._run(PRIORITY_MAINTENANCE, self.handler.clear_sms_storage)
+
+    async def delete_read_messages(self) -> Dict[str, Any]:
+        # Listing and deletes are scheduled one by one, so sends can get in between
+        return await self._offload(self.handler.delete_read_messages)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.handler.close()
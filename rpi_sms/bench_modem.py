@@ -0,0 +1,55 @@
+"""
+Benchmark: SMSHandler against the SIM800 emulator, no hardware needed.
+
+Run:
+  python bench_modem.py                  # 9600 baud, 20 sends, 30 stored messages
+  python bench_modem.py 115200 50 30     # baud, sends, stored messages
+
+Reports per-send latency and throughput, and how long one AT+CMGL poll of a
+full SIM takes. The emulator adds 20 ms per command and 0.5 s per submit.
+"""
+import statistics
+import sys
+import time
+
+from emulator import SIM800Emulator
+from sms import SMSHandler
+
+LATENCY = 0.02
+SEND_LATENCY = 0.5
+
+
+def main() -> None:
+    args = [int(a) for a in sys.argv[1:4]]
+    baud, sends, stored = args + [9600, 20, 30][len(args):]
+
+    with SIM800Emulator(baud=baud, latency=LATENCY, send_latency=SEND_LATENCY, capacity=stored) as emu:
+        # Stored before the handler enables +CMTI, so the poll below finds all of them
+        for i in range(stored):
+            emu.deliver(f"+45{52228856 + i}", f"Indgående besked {i + 1}")
+        sms = SMSHandler(port=emu.port, baud=baud)
+        print(f"{baud} baud, {LATENCY * 1000:.0f} ms per command, {SEND_LATENCY * 1000:.0f} ms per submit")
+
+        timings = []
+        start = time.perf_counter()
+        for i in range(sends):
+            t = time.perf_counter()
+            result = sms.send_sms("+4552228856", f"Benchmark besked {i + 1} med æøå")
+            timings.append(time.perf_counter() - t)
+            if not result["success"]:
+                print(f"  send {i + 1} failed: {result.get('raw_response') or result.get('error')}")
+        total = time.perf_counter() - start
+        print(
+            f"  send     {sends} messages in {total:.2f} s ({sends / total:.2f} msg/s), "
+            f"median {statistics.median(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms"
+        )
+
+        t = time.perf_counter()
+        messages = sms.read_sms()
+        print(f"  receive  {len(messages)} messages in one poll, {(time.perf_counter() - t) * 1000:.0f} ms")
+        print(f"  serial   {emu.stats['bytes_in']} bytes to the modem, {emu.stats['bytes_out']} from it")
+        sms.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: streaming ListingParser vs. the old whole-buffer CMGL parser.
+
+Run:
+  python bench_parser.py                   # synthetic listing, 2000 messages
+  python bench_parser.py 5000              # synthetic listing, 5000 messages
+  python bench_parser.py listing.bin       # a recorded raw AT+CMGL response
+  python bench_parser.py field.smscap      # everything the modem sent in a serial capture
+
+Reports total parse time and, more importantly on a 9600 baud link, how far
+into the listing each parser gets before the first message reaches the callback.
+"""
+import sys
+import time
+from typing import List, Optional
+
+from listing_parser import ListingParser
+from pdu import decode_deliver, encode_deliver, split_text
+from sms import BAUD_RATE, _is_final_line
+from transport import rx_bytes
+
+CHUNK = 64  # bytes per serial read, roughly what in_waiting returns at 9600 baud
+
+SAMPLE_TEXTS = [
+    "Test af svar fra bruger",
+    "Fik du den?",
+    "Svar onsdag kl 21:00",
+    "Tilbagebesked uden kontekst, men med æøå og lidt længere tekst end de andre",
+    "Hvornår kommer du hjem? 😀",
+]
+
+
+def synthetic_listing(count: int) -> bytes:
+    out = [b"\r\n"]
+    for i in range(count):
+        text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+        dcs, _ = split_text(text)
+        pdu = encode_deliver(f"+45{52228856 + i % 97}", text, dcs, "24/10/30,18:31:31+04")
+        out.append(f"+CMGL: {i + 1},1,,{len(pdu) // 2 - 1}\r\n{pdu}\r\n".encode())
+    out.append(b"\r\nOK\r\n")
+    return b"".join(out)
+
+
+def legacy_parse(raw: bytes) -> List[dict]:
+    """
+    The parser SMSHandler used before ListingParser: wait for the whole
+    response, decode it, split lines, header on plain split(",").
+    """
+    lines = [line.strip() for line in raw.decode(errors="ignore").splitlines() if line.strip()]
+    messages: List[dict] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.startswith(("+CMGL:", "+CMGR:")) or i + 1 >= len(lines):
+            i += 1
+            continue
+        parts = [p.strip() for p in line[len("+CMGL:"):].split(",")]
+        pdu_hex = lines[i + 1]
+        i += 2
+        decoded = decode_deliver(pdu_hex)
+        messages.append({"index": int(parts[0]), "status": parts[1], **decoded})
+    return messages
+
+
+def bench_streaming(raw: bytes) -> tuple:
+    parser = ListingParser(_is_final_line)
+    first_at: Optional[int] = None
+    count = 0
+    start = time.perf_counter()
+    for offset in range(0, len(raw), CHUNK):
+        data = raw[offset:offset + CHUNK]
+        while data:
+            for kind, _ in parser.feed(data):
+                if kind == "record":
+                    count += 1
+                    if first_at is None:
+                        first_at = offset + CHUNK
+            if not parser.done:
+                break
+            # A capture holds many responses; start over after each final result code
+            data, parser = parser.remainder, ListingParser(_is_final_line)
+    return time.perf_counter() - start, count, first_at or len(raw)
+
+
+def bench_legacy(raw: bytes) -> tuple:
+    start = time.perf_counter()
+    messages = legacy_parse(raw)
+    return time.perf_counter() - start, len(messages), len(raw)
+
+
+def main() -> None:
+    arg = sys.argv[1] if len(sys.argv) > 1 else "2000"
+    if arg.isdigit():
+        raw = synthetic_listing(int(arg))
+        source = f"synthetic listing, {arg} messages"
+    elif arg.endswith(".smscap"):
+        raw = rx_bytes(arg)
+        source = f"{arg} (modem side)"
+    else:
+        with open(arg, "rb") as f:
+            raw = f.read()
+        source = arg
+
+    bytes_per_sec = BAUD_RATE / 10
+    print(f"{source}: {len(raw)} bytes ({len(raw) / bytes_per_sec:.1f} s on the wire at {BAUD_RATE} baud)")
+    for name, fn in (("legacy", bench_legacy), ("streaming", bench_streaming)):
+        runs = [fn(raw) for _ in range(5)]
+        best = min(r[0] for r in runs)
+        _, count, first_at = runs[0]
+        print(
+            f"  {name:<9} {best * 1000:8.1f} ms  {count} messages  "
+            f"first message after {first_at} bytes ({first_at / bytes_per_sec:.2f} s on the wire)"
+        )
+
+
+if __name__ == "__main__":
+    main()
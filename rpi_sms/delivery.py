@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from phone import phone_key
+
+# The submit PDU asks for 4 days of validity (TP-VP "AA"); no report comes later than that.
+REPORT_TIMEOUT = 4 * 24 * 3600.0
+# TP-MR is one octet, so at most 256 sends per recipient can be told apart anyway.
+MAX_TRACKED = 1024
+# A report can beat the +CMGS that names its reference (the URC thread sees it
+# first); one that matches nothing is kept this long for track() to pick up.
+EARLY_WINDOW = 60.0
+
+
+class DeliveryTracker:
+    """
+    Matches SMS-STATUS-REPORTs to the sends they are about.
+    Sends are keyed by (recipient, TP-MR) per part; the modem assigns the
+    message reference and reports it in +CMGS. The sender opens a message with
+    begin() and track()s each part as soon as its reference is known.
+    report() returns the outcome of the whole message once it is final:
+    "delivered" when every part was, "failed" as soon as one part failed.
+    Reports the SMSC sends while it is still trying ("pending") only update
+    the part, and reports for a reference not tracked yet are held for
+    EARLY_WINDOW seconds.
+    """
+
+    def __init__(
+        self,
+        timeout: float = REPORT_TIMEOUT,
+        max_tracked: int = MAX_TRACKED,
+        early_window: float = EARLY_WINDOW,
+    ):
+        self.timeout = timeout
+        self.max_tracked = max_tracked
+        self.early_window = early_window
+        self._lock = threading.Lock()
+        # (phone, reference) -> message; several keys share one message dict
+        self._parts: "OrderedDict[Tuple[str, int], dict]" = OrderedDict()
+        # (phone, reference) -> (received_at, report) for reports that matched nothing
+        self._early: "OrderedDict[Tuple[str, int], Tuple[float, dict]]" = OrderedDict()
+
+    def begin(self, phone: str, parts: int) -> dict:
+        """A message about to be sent in `parts` parts; pass it to track() and abandon()."""
+        return {
+            "to": phone,
+            "key": phone_key(phone),
+            "parts": parts,
+            "references": [],
+            "outcomes": {},
+            "sent_at": time.monotonic(),
+            "done": False,
+        }
+
+    def track(self, message: dict, reference: int) -> Optional[dict]:
+        """
+        Register one sent part. Returns the final outcome (as report() does)
+        if a report that arrived early makes the message final.
+        """
+        key = (message["key"], reference)
+        with self._lock:
+            self._expire()
+            if message["done"]:
+                return None
+            message["references"].append(reference)
+            message["outcomes"][reference] = None
+            # A reused reference replaces the old, long-finished send
+            self._parts.pop(key, None)
+            self._parts[key] = message
+            while len(self._parts) > self.max_tracked:
+                self._parts.popitem(last=False)
+            early = self._early.pop(key, None)
+            if early is None:
+                return None
+            return self._apply(message, early[1])
+
+    def abandon(self, message: dict) -> None:
+        """The send failed part way; reports for the parts that went out are ignored."""
+        with self._lock:
+            message["done"] = True
+            for ref in message["references"]:
+                if self._parts.get((message["key"], ref)) is message:
+                    del self._parts[(message["key"], ref)]
+
+    def report(self, report: dict) -> Optional[dict]:
+        """
+        Feed one decoded status report (pdu.decode_status_report). Returns
+        {"to", "references", "status", "st", "discharged"} when it made the
+        message final, else None (not final yet, or not tracked yet).
+        """
+        key = (phone_key(report["phone"]), report["reference"])
+        with self._lock:
+            message = self._parts.get(key)
+            if message is None:
+                self._expire()
+                self._early.pop(key, None)
+                self._early[key] = (time.monotonic(), report)
+                while len(self._early) > self.max_tracked:
+                    self._early.popitem(last=False)
+                return None
+            return self._apply(message, report)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len({id(m) for m in self._parts.values()})
+
+    def _apply(self, message: dict, report: dict) -> Optional[dict]:
+        # Caller holds the lock
+        message["outcomes"][report["reference"]] = report["outcome"]
+        outcomes = list(message["outcomes"].values())
+        if "failed" in outcomes:
+            status = "failed"
+        elif len(outcomes) == message["parts"] and all(o == "delivered" for o in outcomes):
+            status = "delivered"
+        else:
+            return None
+        message["done"] = True
+        for ref in message["references"]:
+            self._parts.pop((message["key"], ref), None)
+        return {
+            "to": message["to"],
+            "references": list(message["references"]),
+            "status": status,
+            "st": report["st"],
+            "discharged": report["discharged"],
+        }
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        cutoff = now - self.timeout
+        while self._parts:
+            key, message = next(iter(self._parts.items()))
+            if message["sent_at"] >= cutoff:
+                break
+            del self._parts[key]
+        cutoff = now - self.early_window
+        while self._early:
+            key, (received_at, _) = next(iter(self._early.items()))
+            if received_at >= cutoff:
+                break
+            del self._early[key]
@@ -0,0 +1,466 @@
+"""
+SIM800 emulator on a pseudo-terminal, for running SMSHandler (and the older
+scripts) without hardware.
+
+Speaks the AT subset this repo uses: AT, ATE0/1, CMGF, CSCS, CPMS, CNMI, CREG?,
+CMGL, CMGR, CMGS (with the '>' prompt, PDU and text mode) and CMGD, and raises
++CMTI when a message is delivered to it, and +CDS status reports for PDU
+submits that ask for one (TP-SRR) when CNMI <ds> is 1. Serial speed, response latency, SIM
+capacity and faults are configurable, so latency and throughput numbers are
+repeatable on any Linux box.
+
+In code:
+    with SIM800Emulator(baud=9600, latency=0.02) as emu:
+        emu.deliver("+4552228856", "Hej")
+        sms = SMSHandler(port=emu.port)
+
+Standalone (prints the port to point a script at):
+    python emulator.py --baud 9600 --latency 0.05 --capacity 30 --inbox 10
+"""
+import argparse
+import os
+import random
+import re
+import select
+import threading
+import time
+import tty
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from pdu import (
+    ST_DELIVERED,
+    ST_FAILED,
+    decode_submit_header,
+    encode_deliver,
+    encode_status_report,
+    split_text,
+)
+
+BAUD_RATE = 9600
+CAPACITY = 30
+STORAGE = "SM_P"
+
+# <stat> codes; text mode uses the names
+STAT_NAMES = {0: "REC UNREAD", 1: "REC READ", 2: "STO UNSENT", 3: "STO SENT", 4: "ALL"}
+STAT_CODES = {name: code for code, name in STAT_NAMES.items()}
+
+# +CMS ERROR codes the emulator itself raises
+CMS_INVALID_INDEX = 321
+CMS_INVALID_PDU = 304
+
+
+@dataclass
+class Faults:
+    """
+    Fault injection. Rates are probabilities per command (or per submit).
+    - error_rate:      answer with ERROR instead of running the command
+    - drop_rate:       never answer (the caller sees a timeout)
+    - cms_error_rate:  CMGS submits rejected with +CMS ERROR: <cms_error>
+    - undelivered_rate: accepted submits whose status report says failed
+    """
+    error_rate: float = 0.0
+    drop_rate: float = 0.0
+    cms_error_rate: float = 0.0
+    cms_error: int = 500
+    undelivered_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+class SIM800Emulator:
+    """
+    One emulated modem behind a pty. `port` is the slave device path.
+    - deliver() puts an incoming SMS into storage (and raises +CMTI)
+    - reset() emulates a module reboot: RDY, settings back to defaults
+    - sent holds every submitted message; stats counts commands and bytes
+    """
+
+    def __init__(
+        self,
+        baud: Optional[int] = BAUD_RATE,
+        latency: float = 0.0,
+        send_latency: float = 0.0,
+        capacity: int = CAPACITY,
+        faults: Optional[Faults] = None,
+        report_latency: float = 0.0,
+    ):
+        self.baud = baud
+        self.latency = latency            # before every response
+        self.send_latency = send_latency  # extra time the network takes to accept a submit
+        self.report_latency = report_latency  # from +CMGS to the +CDS status report
+        self.capacity = capacity
+        self.faults = faults or Faults()
+        self._random = random.Random(self.faults.seed)
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self.messages: Dict[int, dict] = {}
+        self.sent: List[dict] = []
+        self.rejected = 0  # deliveries that found the SIM full
+        self.stats = {"commands": 0, "bytes_in": 0, "bytes_out": 0}
+        self._defaults()
+
+        # Commands and deliver() change storage from different threads
+        self._state_lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_mr = 0
+
+    def _defaults(self) -> None:
+        # Power-on settings of a SIM800
+        self.echo = True
+        self.cmgf = 0
+        self.cscs = "IRA"
+        self.storage = STORAGE
+        self.cnmi = [0, 0, 0, 0, 0]
+        self._prompt: Optional[str] = None  # the CMGS argument while waiting for the body
+
+    # ---------- LIFECYCLE ----------
+
+    def start(self) -> "SIM800Emulator":
+        self._thread = threading.Thread(target=self._loop, name="sim800-emulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self) -> "SIM800Emulator":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ---------- SCENARIO ----------
+
+    def deliver(self, phone: str, text: str, scts: Optional[str] = None) -> List[int]:
+        """
+        Store an incoming SMS (several parts if it is long) and raise +CMTI for each
+        part if CNMI asks for it. Returns the storage indexes; parts that do not
+        fit are counted in `rejected`.
+        """
+        scts = scts or time.strftime("%y/%m/%d,%H:%M:%S+04")
+        dcs, segments = split_text(text)
+        with self._state_lock:
+            return self._store(phone, dcs, segments, scts)
+
+    def _store(self, phone: str, dcs: int, segments: List[str], scts: str) -> List[int]:
+        ref = self._random.randint(0, 255)
+        indexes = []
+        for part, segment in enumerate(segments, start=1):
+            udh = bytes([0x00, 0x03, ref, len(segments), part]) if len(segments) > 1 else b""
+            index = self._free_index()
+            if index is None:
+                self.rejected += 1
+                continue
+            self.messages[index] = {
+                "stat": 0,
+                "phone": phone,
+                "scts": scts,
+                "text": segment,
+                "pdu": encode_deliver(phone, segment, dcs, scts, udh),
+            }
+            indexes.append(index)
+            if self.cnmi[1] == 1:
+                self._write(f'\r\n+CMTI: "{self.storage}",{index}\r\n'.encode())
+        return indexes
+
+    def reset(self) -> None:
+        """Emulate a module reboot: settings are lost, the SIM contents are not."""
+        with self._state_lock:
+            self._defaults()
+        self._write(b"\r\nRDY\r\n\r\n+CFUN: 1\r\n\r\n+CPIN: READY\r\n\r\nCall Ready\r\n\r\nSMS Ready\r\n")
+
+    def _free_index(self) -> Optional[int]:
+        for index in range(1, self.capacity + 1):
+            if index not in self.messages:
+                return index
+        return None
+
+    # ---------- SERIAL ----------
+
+    def _throttle(self, n: int) -> None:
+        if self.baud:
+            time.sleep(n * 10 / self.baud)  # 8N1: 10 bits per byte
+
+    def _write(self, data: bytes) -> None:
+        with self._write_lock:
+            # Trickle out in small chunks, like a UART would
+            for i in range(0, len(data), 16):
+                chunk = data[i:i + 16]
+                os.write(self._master, chunk)
+                self.stats["bytes_out"] += len(chunk)
+                self._throttle(len(chunk))
+
+    def _loop(self) -> None:
+        buf = b""
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                return
+            self.stats["bytes_in"] += len(data)
+            self._throttle(len(data))
+            buf += data
+            buf = self._consume(buf)
+
+    def _consume(self, buf: bytes) -> bytes:
+        while buf:
+            if self._prompt is not None:
+                # Message body: ends with Ctrl+Z (submit) or ESC (cancel)
+                end = min((i for i in (buf.find(b"\x1a"), buf.find(b"\x1b")) if i >= 0), default=-1)
+                if end < 0:
+                    return buf
+                body, terminator, buf = buf[:end], buf[end:end + 1], buf[end + 1:]
+                with self._state_lock:
+                    self._submit(body.decode(errors="ignore").strip(), terminator == b"\x1a")
+                continue
+            end = buf.find(b"\r")
+            if end < 0:
+                return buf
+            line, buf = buf[:end].decode(errors="ignore").strip(), buf[end + 1:]
+            if line:
+                if self.echo:
+                    self._write(line.encode() + b"\r")
+                with self._state_lock:
+                    self._command(line)
+        return buf
+
+    # ---------- COMMANDS ----------
+
+    def _respond(self, *lines: str, status: str = "OK") -> None:
+        # Information lines, then the result code, each framed by CR LF as with ATV1
+        out = "\r\n" + "\r\n".join(lines) + "\r\n" if lines else ""
+        self._write(f"{out}\r\n{status}\r\n".encode())
+
+    def _command(self, line: str) -> None:
+        self.stats["commands"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self._random.random() < self.faults.drop_rate:
+            return
+        if self._random.random() < self.faults.error_rate:
+            self._respond(status="ERROR")
+            return
+
+        upper = line.upper()
+        if not upper.startswith("AT"):
+            self._respond(status="ERROR")
+            return
+        match = re.match(r"AT(\+[A-Z]+|E[01])?(\?|=\?|=)?(.*)$", line, re.IGNORECASE)
+        name = (match.group(1) or "").upper()
+        op = match.group(2) or ""
+        args = [a.strip().strip('"') for a in match.group(3).split(",")] if match.group(3) else []
+        if not name and (op or args):
+            # Some other basic command (ATI, ATZ, ...)
+            self._respond(status="ERROR")
+            return
+
+        handler = {
+            "": lambda *_: self._respond(),
+            "E0": lambda *_: self._set_echo(False),
+            "E1": lambda *_: self._set_echo(True),
+            "+CMGF": self._cmgf,
+            "+CSCS": self._cscs,
+            "+CPMS": self._cpms,
+            "+CNMI": self._cnmi,
+            "+CREG": lambda *_: self._respond("+CREG: 0,1"),
+            "+CMGL": self._cmgl,
+            "+CMGR": self._cmgr,
+            "+CMGD": self._cmgd,
+            "+CMGS": self._cmgs,
+        }.get(name)
+        if handler is None:
+            self._respond(status="ERROR")
+            return
+        try:
+            handler(op, args)
+        except (ValueError, IndexError):
+            self._respond(status="ERROR")
+
+    def _set_echo(self, on: bool) -> None:
+        self.echo = on
+        self._respond()
+
+    def _cmgf(self, op: str, args: List[str]) -> None:
+        if op == "?":
+            self._respond(f"+CMGF: {self.cmgf}")
+            return
+        mode = int(args[0])
+        if mode not in (0, 1):
+            raise ValueError(mode)
+        self.cmgf = mode
+        self._respond()
+
+    def _cscs(self, op: str, args: List[str]) -> None:
+        if op == "?":
+            self._respond(f'+CSCS: "{self.cscs}"')
+            return
+        if args[0].upper() not in ("GSM", "IRA", "UCS2", "HEX", "PCCP936"):
+            raise ValueError(args[0])
+        self.cscs = args[0].upper()
+        self._respond()
+
+    def _cpms(self, op: str, args: List[str]) -> None:
+        used, total = len(self.messages), self.capacity
+        if op == "?":
+            s = self.storage
+            self._respond(f'+CPMS: "{s}",{used},{total},"{s}",{used},{total},"{s}",{used},{total}')
+            return
+        self.storage = args[0]
+        self._respond(f"+CPMS: {used},{total},{used},{total},{used},{total}")
+
+    def _cnmi(self, op: str, args: List[str]) -> None:
+        if op == "?":
+            self._respond("+CNMI: " + ",".join(str(v) for v in self.cnmi))
+            return
+        for i, value in enumerate(args[:5]):
+            self.cnmi[i] = int(value)
+        self._respond()
+
+    def _stat_filter(self, args: List[str]) -> int:
+        if not args or args[0] == "":
+            return 0
+        return int(args[0]) if self.cmgf == 0 else STAT_CODES[args[0].upper()]
+
+    def _record(self, index: int, msg: dict, listing: bool) -> List[str]:
+        prefix = f"+CMGL: {index}," if listing else "+CMGR: "
+        if self.cmgf == 0:
+            return [f"{prefix}{msg['stat']},,{len(msg['pdu']) // 2 - 1}", msg["pdu"]]
+        status = STAT_NAMES[msg["stat"]]
+        return [f'{prefix}"{status}","{msg["phone"]}","","{msg["scts"]}"', msg["text"]]
+
+    def _cmgl(self, op: str, args: List[str]) -> None:
+        stat = self._stat_filter(args)
+        lines: List[str] = []
+        for index in sorted(self.messages):
+            msg = self.messages[index]
+            if stat != 4 and msg["stat"] != stat:
+                continue
+            lines.extend(self._record(index, msg, listing=True))
+            if msg["stat"] == 0:
+                msg["stat"] = 1  # Listing marks unread messages as read
+        self._respond(*lines)
+
+    def _cmgr(self, op: str, args: List[str]) -> None:
+        index = int(args[0])
+        if not 1 <= index <= self.capacity:
+            self._respond(status=f"+CMS ERROR: {CMS_INVALID_INDEX}")
+            return
+        msg = self.messages.get(index)
+        if msg is None:
+            self._respond()  # Empty slot: just OK
+            return
+        lines = self._record(index, msg, listing=False)
+        if msg["stat"] == 0:
+            msg["stat"] = 1
+        self._respond(*lines)
+
+    def _cmgd(self, op: str, args: List[str]) -> None:
+        index = int(args[0])
+        delflag = int(args[1]) if len(args) > 1 and args[1] else 0
+        if delflag == 0:
+            if not 1 <= index <= self.capacity:
+                self._respond(status=f"+CMS ERROR: {CMS_INVALID_INDEX}")
+                return
+            self.messages.pop(index, None)
+        else:
+            # 1: read, 2: read+sent, 3: read+sent+unsent, 4: everything
+            doomed = {1: {1}, 2: {1, 3}, 3: {1, 2, 3}, 4: {0, 1, 2, 3}}[delflag]
+            for i in [i for i, m in self.messages.items() if m["stat"] in doomed]:
+                del self.messages[i]
+        self._respond()
+
+    def _cmgs(self, op: str, args: List[str]) -> None:
+        if op != "=" or not args or not args[0]:
+            raise ValueError("AT+CMGS needs an argument")
+        self._prompt = args[0]
+        self._write(b"\r\n> ")
+
+    def _submit(self, body: str, send: bool) -> None:
+        arg, self._prompt = self._prompt, None
+        if not send:
+            self._respond()  # ESC: cancelled
+            return
+        if self.send_latency:
+            time.sleep(self.send_latency)
+        if self.cmgf == 0:
+            # <length> counts TPDU octets, after the SMSC part
+            try:
+                octets = bytes.fromhex(body)
+            except ValueError:
+                octets = b""
+            if not octets or len(octets) - 1 - octets[0] != int(arg):
+                self._respond(status=f"+CMS ERROR: {CMS_INVALID_PDU}")
+                return
+            record = {"pdu": body, "length": int(arg)}
+        else:
+            record = {"phone": arg, "text": body}
+        if self._random.random() < self.faults.cms_error_rate:
+            self._respond(status=f"+CMS ERROR: {self.faults.cms_error}")
+            return
+        mr = self._next_mr
+        self._next_mr = (self._next_mr + 1) % 256
+        self.sent.append({**record, "mr": mr, "at": time.time()})
+        self._respond(f"+CMGS: {mr}")
+        if self.cmgf == 0 and self.cnmi[3] == 1:
+            header = decode_submit_header(body)
+            if header["status_report"]:
+                timer = threading.Timer(self.report_latency, self._status_report, (header["phone"], mr))
+                timer.daemon = True
+                timer.start()
+
+    def _status_report(self, phone: str, mr: int) -> None:
+        if self._stop.is_set():
+            return
+        status = ST_FAILED if self._random.random() < self.faults.undelivered_rate else ST_DELIVERED
+        now = time.strftime("%y/%m/%d,%H:%M:%S+04")
+        pdu = encode_status_report(phone, mr, status, now, now)
+        self._write(f"\r\n+CDS: {len(pdu) // 2 - 1}\r\n{pdu}\r\n".encode())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SIM800 emulator on a pseudo-terminal")
+    parser.add_argument("--baud", type=int, default=BAUD_RATE, help="0 disables throttling")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="extra seconds per CMGS submit")
+    parser.add_argument("--capacity", type=int, default=CAPACITY, help="SIM message slots")
+    parser.add_argument("--inbox", type=int, default=0, help="unread messages to start with")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--cms-error-rate", type=float, default=0.0)
+    parser.add_argument("--report-latency", type=float, default=0.0, help="seconds until a +CDS status report")
+    parser.add_argument("--undelivered-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    faults = Faults(
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        cms_error_rate=args.cms_error_rate,
+        undelivered_rate=args.undelivered_rate,
+    )
+    emu = SIM800Emulator(args.baud, args.latency, args.send_latency, args.capacity, faults, args.report_latency)
+    for i in range(args.inbox):
+        emu.deliver(f"+45{52228856 + i}", f"Testbesked {i + 1}")
+    emu.start()
+    print(f"SIM800 emulator on {emu.port} ({args.baud or 'unthrottled'} baud). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n{emu.stats}, {len(emu.sent)} sent, {len(emu.messages)} stored")
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,93 @@
 from flask import Flask, request, jsonify
-import subprocess
+import os
+import sys
+
+# Number normalization (phone.py) and segmentation (pdu.py, used by outbox) are
+# shared with the AT-command service in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from outbox import GAMMU_DB, ConnectionPool, OutboxWriter, sqlite_connect
+from phone import normalize, phone_key
 
 app = Flask(__name__)
 
+# gammu-smsd's SQL database (smsdrc: Service = sql, Driver = sqlite3, Database = the same file)
+DB_PATH = os.environ.get("GAMMU_DB", GAMMU_DB)
+outbox = OutboxWriter(ConnectionPool(lambda: sqlite_connect(DB_PATH)))
+outbox.create_schema()
+
+MAX_BATCH = 1000
+
 @app.route("/send", methods=["POST"])
 def send_sms():
     number = request.json["number"]
     text = request.json["text"]
 
-    cmd = [
-        "gammu-smsd-inject",
-        "TEXT",
-        number,
-        "-text",
-        text,
-    ]
-
-    subprocess.run(cmd, check=True)
+    # gammu-smsd picks the row up from its outbox; no gammu-smsd-inject process per message
+    outbox.queue_sms(phone_key(number), text)
 
     return jsonify({"status": "sent"})
 
 
+def _normalize_numbers(numbers):
+    """
+    Normalize every distinct number once. Returns {raw: E.164 number or None}.
+    """
+    return {raw: normalize(raw) for raw in set(numbers)}
+
+
+@app.route("/send/batch", methods=["POST"])
+def send_batch():
+    """
+    Queue many SMS in one request and one transaction. Body is either
+      {"messages": [{"number": "...", "text": "..."}, ...]}
+    or one text for many recipients:
+      {"text": "...", "numbers": ["...", ...]}
+    Every item gets a result, in request order: "queued" with its outbox id,
+    "invalid" with an error, or "duplicate" for a repeated (number, text).
+    """
+    body = request.get_json(silent=True) or {}
+    if "messages" in body:
+        pairs = [(m.get("number"), m.get("text")) if isinstance(m, dict) else (None, None) for m in body["messages"]]
+    elif "numbers" in body:
+        pairs = [(number, body.get("text")) for number in body["numbers"]]
+    else:
+        return jsonify({"error": 'expected "messages" or "text" + "numbers"'}), 400
+    if not pairs:
+        return jsonify({"error": "empty batch"}), 400
+    if len(pairs) > MAX_BATCH:
+        return jsonify({"error": f"at most {MAX_BATCH} messages per batch"}), 413
+
+    normalized = _normalize_numbers(number for number, _ in pairs if isinstance(number, str))
+    results = []
+    to_queue = []  # (result index, number, text)
+    seen = set()
+    for i, (raw, text) in enumerate(pairs):
+        number = normalized.get(raw) if isinstance(raw, str) else None
+        if number is None:
+            results.append({"index": i, "number": raw, "status": "invalid", "error": "invalid number"})
+        elif not isinstance(text, str) or not text.strip():
+            results.append({"index": i, "number": number, "status": "invalid", "error": "empty text"})
+        elif (number, text) in seen:
+            results.append({"index": i, "number": number, "status": "duplicate"})
+        else:
+            seen.add((number, text))
+            results.append({"index": i, "number": number, "status": "queued"})
+            to_queue.append((i, number, text))
+
+    if to_queue:
+        try:
+            ids = outbox.queue_many([(number, text) for _, number, text in to_queue])
+        except Exception as e:
+            return jsonify({"error": f"could not queue batch: {e}"}), 500
+        for (i, _, _), outbox_id in zip(to_queue, ids):
+            results[i]["id"] = outbox_id
+
+    return jsonify({
+        "queued": len(to_queue),
+        "rejected": len(results) - len(to_queue),
+        "results": results,
+    })
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=8000)
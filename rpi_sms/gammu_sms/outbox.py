@@ -0,0 +1,202 @@
+"""
+Queue SMS for gammu-smsd by writing its outbox tables directly, instead of
+spawning gammu-smsd-inject (a process start and config parse per message).
+
+Rows follow the gammu-smsd SQL schema: the first part goes into `outbox`
+(MultiPart='true' when the text needs several SMS), the remaining parts into
+`outbox_multipart` with the same ID, all in one transaction so the daemon never
+picks up half a message.
+
+SQLite (gammu's sqlite3 driver) is the default and the local stand-in; for
+MariaDB pass a DB-API connect function and placeholder="%s":
+    OutboxWriter(ConnectionPool(lambda: pymysql.connect(...)), placeholder="%s")
+
+Segmentation is pdu.split_text from the parent directory (main.py puts it on
+sys.path): GSM 7-bit when the text fits the default alphabet, UCS2 otherwise.
+"""
+import queue
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+from pdu import DCS_GSM7, split_text
+
+GAMMU_DB = "smsd.db"
+CREATOR_ID = "rpi_sms"
+POOL_SIZE = 4
+
+CODING_GSM7 = "Default_No_Compression"
+CODING_UCS2 = "Unicode_No_Compression"
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    UpdatedInDB NUMERIC NOT NULL DEFAULT (datetime('now')),
+    InsertIntoDB NUMERIC NOT NULL DEFAULT (datetime('now')),
+    SendingDateTime NUMERIC NOT NULL DEFAULT (datetime('now')),
+    SendBefore TIME NOT NULL DEFAULT '23:59:59',
+    SendAfter TIME NOT NULL DEFAULT '00:00:00',
+    Text TEXT,
+    DestinationNumber TEXT NOT NULL DEFAULT '',
+    Coding TEXT NOT NULL DEFAULT 'Default_No_Compression',
+    UDH TEXT,
+    Class INTEGER DEFAULT -1,
+    TextDecoded TEXT NOT NULL DEFAULT '',
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    MultiPart TEXT NOT NULL DEFAULT 'false',
+    RelativeValidity INTEGER DEFAULT -1,
+    SenderID TEXT,
+    SendingTimeOut NUMERIC NULL DEFAULT (datetime('now')),
+    DeliveryReport TEXT DEFAULT 'default',
+    CreatorID TEXT NOT NULL,
+    Retries INTEGER DEFAULT 0,
+    Priority INTEGER DEFAULT 0,
+    Status TEXT NOT NULL DEFAULT 'Reserved',
+    StatusCode INTEGER NOT NULL DEFAULT -1
+);
+CREATE INDEX IF NOT EXISTS outbox_date ON outbox (SendingDateTime, SendingTimeOut);
+CREATE INDEX IF NOT EXISTS outbox_sender ON outbox (SenderID);
+CREATE TABLE IF NOT EXISTS outbox_multipart (
+    Text TEXT,
+    Coding TEXT NOT NULL DEFAULT 'Default_No_Compression',
+    UDH TEXT,
+    Class INTEGER DEFAULT -1,
+    TextDecoded TEXT DEFAULT NULL,
+    ID INTEGER,
+    SequencePosition INTEGER NOT NULL DEFAULT 1,
+    Status TEXT NOT NULL DEFAULT 'Reserved',
+    StatusCode INTEGER NOT NULL DEFAULT -1,
+    PRIMARY KEY (ID, SequencePosition)
+);
+"""
+
+
+# ---------- SEGMENTATION ----------
+
+def segment(text: str) -> Tuple[str, List[str]]:
+    """
+    Returns (gammu Coding, parts), split the way the modem service splits them.
+    """
+    dcs, parts = split_text(text)
+    return (CODING_GSM7 if dcs == DCS_GSM7 else CODING_UCS2), parts
+
+
+def _udh(ref: int, total: int, seq: int) -> str:
+    # 8-bit reference concatenation IE, as gammu writes it
+    return f"050003{ref:02X}{total:02X}{seq:02X}"
+
+
+# ---------- CONNECTIONS ----------
+
+def sqlite_connect(path: str = GAMMU_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")  # gammu-smsd reads while we write
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+class ConnectionPool:
+    """
+    A fixed set of DB-API connections, opened lazily and reused, so a request
+    never pays for a connect.
+    """
+
+    def __init__(self, connect: Callable[[], object], size: int = POOL_SIZE):
+        self._connect = connect
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.Semaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[object]:
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    conn = None  # Broken; the next caller opens a fresh one
+                raise
+            finally:
+                if conn is not None:
+                    self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+# ---------- OUTBOX ----------
+
+class OutboxWriter:
+    """
+    Writes gammu-smsd outbox rows. `placeholder` is the DB-API parameter
+    marker of the driver ("?" for sqlite3, "%s" for MySQL/MariaDB drivers).
+    """
+
+    def __init__(self, pool: ConnectionPool, creator: str = CREATOR_ID, placeholder: str = "?"):
+        self.pool = pool
+        self.creator = creator
+        p = placeholder
+        self._insert_outbox = (
+            "INSERT INTO outbox (DestinationNumber, TextDecoded, Coding, UDH, MultiPart,"
+            f" DeliveryReport, CreatorID) VALUES ({p}, {p}, {p}, {p}, {p}, {p}, {p})"
+        )
+        self._insert_part = (
+            "INSERT INTO outbox_multipart (ID, SequencePosition, TextDecoded, Coding, UDH)"
+            f" VALUES ({p}, {p}, {p}, {p}, {p})"
+        )
+
+    def create_schema(self) -> None:
+        """Create the outbox tables if missing (SQLite only; MariaDB uses gammu's own schema)."""
+        with self.pool.connection() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            conn.commit()
+
+    def _insert(self, cursor, number: str, coding: str, parts: List[str], delivery_report: bool) -> int:
+        report = "yes" if delivery_report else "default"
+        if len(parts) == 1:
+            cursor.execute(self._insert_outbox, (number, parts[0], coding, None, "false", report, self.creator))
+            return cursor.lastrowid
+
+        ref = random.randint(0, 255)
+        total = len(parts)
+        cursor.execute(
+            self._insert_outbox,
+            (number, parts[0], coding, _udh(ref, total, 1), "true", report, self.creator),
+        )
+        outbox_id = cursor.lastrowid
+        cursor.executemany(
+            self._insert_part,
+            [(outbox_id, seq, part, coding, _udh(ref, total, seq)) for seq, part in enumerate(parts[1:], start=2)],
+        )
+        return outbox_id
+
+    def queue_sms(self, number: str, text: str, delivery_report: bool = False) -> int:
+        """
+        Queue one SMS (all of its parts) for gammu-smsd. Returns the outbox ID.
+        """
+        coding, parts = segment(text)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            outbox_id = self._insert(cursor, number, coding, parts, delivery_report)
+            conn.commit()
+            return outbox_id
+
+    def queue_many(self, items: List[Tuple[str, str]], delivery_report: bool = False) -> List[int]:
+        """
+        Queue (number, text) pairs in a single transaction: either all of them
+        reach the outbox or none do. Each distinct text is segmented once, so a
+        broadcast costs one segmentation. Returns the outbox IDs in order.
+        """
+        segmented = {text: segment(text) for text in {text for _, text in items}}
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            ids = [self._insert(cursor, number, *segmented[text], delivery_report) for number, text in items]
+            conn.commit()
+            return ids
@@ -0,0 +1,154 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+JOURNAL_DB = "journal.db"
+RECENT_HASHES = 10000  # size of the in-memory dedup index
+PAGE_SIZE = 500        # rows fetched per query when streaming
+
+_ROW_COLUMNS = ("id", "direction", "phone", "content", "modem_time", "recorded_at")
+
+
+def message_hash(phone: str, timestamp: str, content: str) -> str:
+    """
+    Natural key of a message: who, when (as the modem reported it) and what.
+    """
+    key = "\x1f".join((phone or "", timestamp or "", content or ""))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class MessageJournal:
+    """
+    Append-only local record of every inbound and outbound SMS on the Pi.
+    Once a message is journaled it no longer needs to stay on the SIM.
+
+    Rows are keyed by message_hash(); a bounded in-memory index of recent hashes
+    answers "seen before?" without touching SQLite, and the UNIQUE column catches
+    anything older. Duplicate records return None, so callers can suppress
+    repeated callbacks and webhook posts.
+    """
+
+    def __init__(self, db_path: str = JOURNAL_DB, recent: int = RECENT_HASHES):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hash TEXT NOT NULL UNIQUE,
+                direction TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                content TEXT NOT NULL,
+                modem_time TEXT,
+                recorded_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+        self._recent_size = recent
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        rows = self._db.execute(
+            "SELECT hash FROM messages ORDER BY id DESC LIMIT ?", (recent,)
+        ).fetchall()
+        for (h,) in reversed(rows):
+            self._recent[h] = None
+
+    def _remember(self, h: str) -> None:
+        self._recent[h] = None
+        if len(self._recent) > self._recent_size:
+            self._recent.popitem(last=False)
+
+    def _insert(
+        self, direction: str, phone: str, content: str, modem_time: str, key: Optional[str] = None
+    ) -> Optional[int]:
+        # Caller holds the lock and commits. `key` replaces modem_time in the
+        # hash when the timestamp alone does not tell two messages apart.
+        h = message_hash(phone, modem_time if key is None else key, content)
+        if h in self._recent:
+            return None
+        cur = self._db.execute(
+            "INSERT OR IGNORE INTO messages (hash, direction, phone, content, modem_time, recorded_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (h, direction, phone, content, modem_time, time.time()),
+        )
+        self._remember(h)
+        return cur.lastrowid if cur.rowcount else None
+
+    def _append(
+        self, direction: str, phone: str, content: str, modem_time: str, key: Optional[str] = None
+    ) -> Optional[int]:
+        with self._lock:
+            rowid = self._insert(direction, phone, content, modem_time, key)
+            self._db.commit()
+            return rowid
+
+    def record_inbound(self, msg: dict) -> Optional[int]:
+        """
+        Journal a received SMS. Returns its row id, or None if it was seen before.
+        A "key" in `msg` (a unique id from the receiver) replaces the timestamp
+        in the dedup hash.
+        """
+        return self._append("in", msg["phone"], msg["content"], msg.get("createdAt", ""), msg.get("key"))
+
+    def record_inbound_many(self, msgs: List[dict]) -> List[Optional[int]]:
+        """
+        Journal a batch of received SMS in one transaction. Returns one row id
+        (or None for a duplicate) per message, in order.
+        """
+        with self._lock:
+            rowids = [
+                self._insert("in", m["phone"], m["content"], m.get("createdAt", ""), m.get("key"))
+                for m in msgs
+            ]
+            self._db.commit()
+        return rowids
+
+    def record_outbound(
+        self, phone: str, content: str, sent_at: Optional[str] = None, job_id: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Journal a sent SMS. Outbound messages have no modem timestamp, so the send
+        time is stored in its place. A queue job id, when given, keys the row
+        instead, so two identical texts sent in the same second both count.
+        """
+        sent_at = sent_at or time.strftime("%y/%m/%d,%H:%M:%S")
+        return self._append("out", phone, content, sent_at, job_id)
+
+    # ---------- SYNC ----------
+
+    def page(self, since: int = 0, limit: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` messages with id > `since`, oldest first (keyset pagination).
+        """
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_ROW_COLUMNS)} FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        return [dict(zip(_ROW_COLUMNS, row)) for row in rows]
+
+    def iter_since(self, since: int = 0, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield messages with id > `since` page by page, so a large backlog is never
+        held in memory at once. Stops after `limit` messages if given.
+        """
+        remaining = limit
+        cursor = since
+        while remaining is None or remaining > 0:
+            size = PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+            rows = self.page(cursor, size)
+            if not rows:
+                return
+            for row in rows:
+                cursor = row["id"]
+                yield row
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
@@ -0,0 +1,174 @@
+from typing import Any, Callable, List, Optional, Tuple
+
+from pdu import decode_deliver
+
+# <stat> values in PDU mode, mapped to the text-mode names the rest of the code uses
+PDU_STATUS = {0: "REC UNREAD", 1: "REC READ", 2: "STO UNSENT", 3: "STO SENT", 4: "ALL"}
+
+HEADER_PREFIXES = (b"+CMGL:", b"+CMGR:")
+
+_IDLE, _PDU_BODY, _TEXT_BODY = range(3)
+
+
+def split_header(header: str) -> List[str]:
+    """
+    Split a CMGL/CMGR header on commas outside double quotes and unquote the
+    fields, so '"24/10/30,18:31:31+04"' stays one field.
+    """
+    fields: List[str] = []
+    current: List[str] = []
+    quoted = False
+    for c in header:
+        if c == '"':
+            quoted = not quoted
+        elif c == "," and not quoted:
+            fields.append("".join(current).strip())
+            current = []
+        else:
+            current.append(c)
+    fields.append("".join(current).strip())
+    return fields
+
+
+class ListingParser:
+    """
+    Incremental parser for AT+CMGL / AT+CMGR responses, fed raw bytes as they
+    arrive from the serial port.
+
+    feed() returns events in order:
+    - ("record", msg)  a complete message, as soon as its last byte is in
+    - ("line", text)   any other line (echo, URCs) for the caller to route
+    - ("final", code)  the final result code; the parser stops there and leaves
+                       any bytes after it in `remainder`
+
+    Both SMS modes are understood. PDU mode records are a header plus one hex
+    line. Text mode headers are quoted CSV (fields may contain commas) and the
+    body may span several lines; it ends at the next header, or at a final
+    result code preceded by the blank separator line the modem sends.
+    """
+
+    def __init__(self, is_final: Callable[[str], bool], index: Optional[int] = None):
+        self.is_final = is_final
+        # CMGR headers carry no index; the caller knows which one it asked for
+        self.index = index
+        self.status: Optional[str] = None
+        self.remainder = b""
+        self._buf = b""
+        self._state = _IDLE
+        self._header: List[str] = []
+        self._body: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status is not None
+
+    def feed(self, data: bytes) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        if self.done:
+            self.remainder += data
+            return events
+
+        lines = (self._buf + data).split(b"\n")
+        # The last piece has no line ending yet; keep it for the next chunk
+        self._buf = lines.pop()
+        for i, raw in enumerate(lines):
+            self._line(raw.rstrip(b"\r"), events)
+            if self.done:
+                self.remainder = b"\n".join(lines[i + 1:] + [self._buf])
+                self._buf = b""
+                break
+        return events
+
+    # ---------- STATE MACHINE ----------
+
+    def _line(self, raw: bytes, events: List[Tuple[str, Any]]) -> None:
+        if self._state == _TEXT_BODY:
+            self._text_body_line(raw, events)
+            return
+
+        line = raw.decode(errors="ignore").strip()
+        if self._state == _PDU_BODY:
+            if not line:
+                return
+            if line.startswith("+"):
+                # A URC squeezed in between header and PDU
+                events.append(("line", line))
+                return
+            self._emit_pdu(line, events)
+            self._state = _IDLE
+            return
+
+        if not line:
+            return
+        if raw.startswith(HEADER_PREFIXES):
+            self._start_record(line)
+        elif self.is_final(line):
+            self.status = line
+            events.append(("final", line))
+        else:
+            events.append(("line", line))
+
+    def _start_record(self, line: str) -> None:
+        fields = split_header(line[len("+CMGL:"):])
+        if line.startswith("+CMGR:"):
+            fields = [str(self.index)] + fields
+        self._header = fields
+        self._body = []
+        # PDU mode: numeric <stat>; text mode: quoted "REC UNREAD" etc.
+        is_pdu = len(fields) > 1 and fields[1].isdigit()
+        self._state = _PDU_BODY if is_pdu else _TEXT_BODY
+
+    def _text_body_line(self, raw: bytes, events: List[Tuple[str, Any]]) -> None:
+        line = raw.decode(errors="ignore")
+        stripped = line.strip()
+        if raw.startswith(HEADER_PREFIXES):
+            self._emit_text(events)
+            self._start_record(stripped)
+            return
+        if self.is_final(stripped) and self._body and not self._body[-1].strip():
+            self._emit_text(events)
+            self.status = stripped
+            events.append(("final", stripped))
+            return
+        self._body.append(line)
+
+    # ---------- RECORDS ----------
+
+    def _record_index(self) -> Optional[int]:
+        try:
+            return int(self._header[0])
+        except (IndexError, ValueError):
+            return None
+
+    def _emit_pdu(self, pdu_hex: str, events: List[Tuple[str, Any]]) -> None:
+        index = self._record_index()
+        try:
+            decoded = decode_deliver(pdu_hex)
+            stat = int(self._header[1])
+        except (ValueError, IndexError) as e:
+            print(f"[SMS Parse Error] index {index}: {e}")
+            return
+        events.append(("record", {
+            "index": index,
+            "status": PDU_STATUS.get(stat, str(stat)),
+            "phone": decoded["phone"],
+            "createdAt": decoded["createdAt"],
+            "content": decoded["content"],
+            "concat": decoded["concat"],
+        }))
+
+    def _emit_text(self, events: List[Tuple[str, Any]]) -> None:
+        self._state = _IDLE
+        fields = self._header + [""] * (5 - len(self._header))
+        body = self._body
+        # Drop the blank separator line(s) before the next header / OK
+        while body and not body[-1].strip():
+            body = body[:-1]
+        events.append(("record", {
+            "index": self._record_index(),
+            "status": fields[1],
+            "phone": fields[2],
+            "createdAt": fields[4],
+            "content": "\n".join(body),
+            "concat": None,
+        }))
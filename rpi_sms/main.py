@@ -6,45 +6,156 @@
 # run:
 # uvicorn main:app --host 0.0.0.0 --port 8000
 """
-send SMS:
+send SMS (queued, returns 202 with a job id):
 
 curl -X POST http://<pi-ip>:8000/send \
      -H "Content-Type: application/json" \
      -d '{"phone": "52228856", "message": "Hello!"}'
 
+send status ("queued", "sending", "sent" or "failed"; with SMS_DELIVERY_REPORTS=1 also
+"delivery": "delivered" or "failed" once the status report is in, which is pushed to the
+webhook as {"type": "delivery_report", "id": <id>, ...} too):
+curl http://<pi-ip>:8000/send/<id>
+
 receive SMS:
 curl http://raspberrypi:8000/receive
+
+sync stored messages (NDJSON, one message per line; resume with the last "cursor" seen):
+curl "http://raspberrypi:8000/messages?since=0"
+
+metrics (Prometheus text format):
+curl http://raspberrypi:8000/metrics
+
+modems in the pool (SMS_PORTS=/dev/serial0,/dev/ttyUSB0 to use several), with each
+modem's command scheduler queue depth and wait times:
+curl http://raspberrypi:8000/modems
 """
+import json
+import os
+from typing import Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from sms import SMSHandler
-from webhook import handle_incoming_sms
+import metrics
+from sms import SERIAL_PORT, SMSHandler
+from phone import phone_key
+from pool import ModemPool
+from async_sms import AsyncSMSHandler
+from journal import MessageJournal
+from send_queue import SendQueue
+from storage import StorageManager
+from webhook import dispatcher as webhook_dispatcher, handle_incoming_sms, notify_webhook
 
 app = FastAPI()
-sms = SMSHandler()
-sms.set_callback(handle_incoming_sms)
-sms.start_receiver_thread()  # Starts listening for incoming messages
+SERIAL_PORTS = os.environ.get("SMS_PORTS", SERIAL_PORT).split(",")
+# SMS_CAPTURE=<file> records all serial traffic for replay (python transport.py dump <file>);
+# with several modems each port gets its own <file>.<port name>
+CAPTURE = os.environ.get("SMS_CAPTURE")
+# SMS_DELIVERY_REPORTS=1 asks the network for a status report on every send
+DELIVERY_REPORTS = os.environ.get("SMS_DELIVERY_REPORTS") == "1"
+
+def _capture_file(port: str) -> Optional[str]:
+    if not CAPTURE or len(SERIAL_PORTS) == 1:
+        return CAPTURE
+    return f"{CAPTURE}.{os.path.basename(port)}"
+
+pool = ModemPool({
+    port: SMSHandler(port, capture=_capture_file(port), delivery_reports=DELIVERY_REPORTS)
+    for port in SERIAL_PORTS
+})
+journal = MessageJournal()
+# Compacts once the SIM passes the high watermark, not after every message
+storages = {m.name: StorageManager(m.handler) for m in pool.modems}
+
+def on_incoming_sms(sms_data: dict):
+    if journal.record_inbound(sms_data) is None:
+        return  # Already seen (e.g. /receive re-listed it); don't notify twice
+    handle_incoming_sms(sms_data)
+    storages[sms_data["modem"]].notify()  # Check SIM usage soon after new messages land
+
+pool.set_callback(on_incoming_sms)
+pool.start_receiver_thread()  # Starts listening for incoming messages on every modem
+for storage in storages.values():
+    storage.start()  # Compacts SIM storage in the background past the high watermark
+webhook_dispatcher.start()  # Delivers queued webhook posts, catching up after downtime
+modem = AsyncSMSHandler(pool)  # Awaitable API for the endpoints
+def on_delivery(job: dict, report: dict):
+    notify_webhook({
+        "type": "delivery_report",
+        "id": job["id"],
+        "phone": job["phone"],
+        "content": job["message"],  # lets the web app find the message it sent
+        "status": report["status"],
+        "discharged": report["discharged"],
+    })
+
+send_queue = SendQueue(
+    pool.send_sms,
+    on_sent=lambda job: journal.record_outbound(job["phone"], job["message"], job_id=job["id"]),
+    workers=len(pool),
+    on_delivery=on_delivery,
+)
+send_queue.start()  # One worker per modem drains queued sends
+# Reports for sends that did not go through the queue match no job and are dropped there
+pool.set_report_callback(send_queue.record_delivery)
 
 class SMSRequest(BaseModel):
     phone: str
     message: str
 
-@app.post("/send")
-def send_sms(request: SMSRequest):
+@app.post("/send", status_code=202)
+async def send_sms(request: SMSRequest):
     try:
-        print(f"Sending SMS to {request.phone}: {request.message}")
-        result = sms.send_sms(request.phone, request.message)
-        print(f"SMS sent successfully: {result}")
-        return result
+        # Canonical number, so the journal, per-phone ordering and sticky routing see one key
+        phone = phone_key(request.phone)
+        job = send_queue.enqueue(phone, request.message)
+        print(f"Queued SMS {job['id']} to {phone}: {request.message}")
+        return job
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/send/{job_id}")
+async def send_status(job_id: str):
+    job = send_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job id")
+    return job
 # How can i make it so that if i send /read it also does the same as /receive?
 # While keeping the /receive endpoint for reading SMS messages?
 # so it can be used interchangeably
 @app.get("/receive")
-def receive_sms():
+async def receive_sms():
     try:
-        messages = sms.read_sms()
+        messages = await modem.read_sms()
         return {"messages": messages}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/messages")
+async def sync_messages(since: int = 0, limit: Optional[int] = None):
+    """
+    Stream journaled messages with cursor > `since` as NDJSON, oldest first.
+    Each line carries its "cursor"; pass the last one as `since` to resume.
+    The journal is paged server-side, so thousands of messages stream in
+    constant memory.
+    """
+    if since < 0 or (limit is not None and limit <= 0):
+        raise HTTPException(status_code=400, detail="since must be >= 0 and limit > 0")
+
+    def _ndjson():
+        for row in journal.iter_since(since, limit):
+            row = {"cursor": row.pop("id"), **row}
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # Queue depths are read at scrape time; everything else is recorded where it happens
+    metrics.SEND_QUEUE_DEPTH.set(send_queue.depth())
+    metrics.WEBHOOK_PENDING.set(webhook_dispatcher.pending())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/modems")
+async def modem_status():
+    return {"modems": pool.status()}
@@ -0,0 +1,171 @@
+"""
+Minimal in-process metrics in the Prometheus text exposition format, served by
+GET /metrics in main.py.
+
+Kept dependency-free and cheap enough to leave on on a Pi: recording is a dict
+lookup, a bisect over the bucket bounds and a few additions under a per-metric
+lock. All formatting happens at scrape time.
+
+Label values are passed positionally, in the order the metric declares them:
+  AT_LATENCY.observe(0.12, "AT+CMGS")
+  SERIAL_BYTES.inc("in", amount=64)
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    """A value that is set rather than accumulated, e.g. a queue depth read at scrape time."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        out: List[str] = []
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                out.append(f"{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            out.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            out.append(f"{self.name}_count{suffix} {count}")
+        return out
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# ---------- MODEM ----------
+
+AT_LATENCY = Histogram(
+    "sms_at_command_seconds", "Time from writing an AT command to its final result code.", ["command"]
+)
+AT_ERRORS = Counter(
+    "sms_at_command_errors_total", "AT commands that ended in ERROR, +CMS/+CME ERROR or a timeout.",
+    ["command", "status"],
+)
+SERIAL_BYTES = Counter("sms_serial_bytes_total", "Bytes moved over the serial port.", ["direction"])
+SCHEDULER_WAIT = Histogram(
+    "sms_scheduler_wait_seconds", "Time a modem job waited in the command scheduler before it ran.",
+    ["modem", "priority"],
+)
+SCHEDULER_DEPTH = Gauge("sms_scheduler_queue_depth", "Modem jobs waiting in the command scheduler.", ["modem", "priority"])
+
+# ---------- SEND / RECEIVE ----------
+
+SEND_LATENCY = Histogram("sms_send_seconds", "Duration of send_sms, all parts included.")
+SEND_TOTAL = Counter(
+    "sms_send_total", "send_sms outcomes; cms_error is empty unless the modem reported one.",
+    ["outcome", "cms_error"],
+)
+POLL_LATENCY = Histogram("sms_receive_poll_seconds", "Duration of one AT+CMGL receive poll.")
+POLL_MESSAGES = Histogram(
+    "sms_receive_poll_messages", "Messages listed per receive poll.", buckets=COUNT_BUCKETS
+)
+POLL_PROBES = Counter(
+    "sms_receive_probes_total", "AT+CPMS? probes before a receive poll, by result (unchanged, changed, error).",
+    ["result"],
+)
+POLL_INTERVAL = Gauge("sms_receive_poll_interval_seconds", "Current wait between receive polls.")
+DELIVERY_REPORTS = Counter(
+    "sms_delivery_reports_total", "Status reports received, by outcome (delivered, pending, failed).", ["outcome"]
+)
+SEND_QUEUE_DEPTH = Gauge("sms_send_queue_depth", "Send jobs queued or in flight.")
+
+# ---------- WEBHOOK ----------
+
+WEBHOOK_LATENCY = Histogram("webhook_delivery_seconds", "Duration of one webhook POST attempt.")
+WEBHOOK_TOTAL = Counter(
+    "webhook_delivery_total", "Webhook POST attempts by result (delivered, retry, rejected).", ["result"]
+)
+WEBHOOK_PENDING = Gauge("webhook_outbox_pending", "Payloads waiting in the webhook outbox.")
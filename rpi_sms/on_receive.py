@@ -1,58 +1,44 @@
 #!/usr/bin/env python3
+# gammu-smsd RunOnReceive hook. Hands the message to receive_daemon.py over
+# its Unix socket and exits; the daemon journals and forwards it.
 
 import os
 import sys
 import json
-import urllib.request
-import urllib.error
-from datetime import datetime
+import time
+import socket
 
-MAC_URL = "http://rubensmac.com:3000/api/receive-sms-webhook"
-LOGFILE = "/home/pi/sms-webhook.log"
+SOCKET_PATH = "/tmp/sms-receive.sock"
+SPOOL_DIR = "/home/pi/sms-spool"
 
 
-def log(msg):
-    with open(LOGFILE, "a") as f:
-        f.write(f"{datetime.now():%F %T} {msg}\n")
-
-
-def get_text():
-    numparts = int(os.environ.get("DECODED_PARTS", "0"))
-    if numparts == 0:
-        return os.environ.get("SMS_1_TEXT", "")
-    text = ""
-    for i in range(1, numparts + 1):
-        varname = f"DECODED_{i}_TEXT"
-        if varname in os.environ:
-            text += os.environ[varname]
-    return text
+def spool(data):
+    # Daemon not running: leave the message where it looks on startup
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, f"{time.time_ns():020d}-{os.getpid()}.json")
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
 
 
 def main():
-    phone = os.environ.get("SMS_1_NUMBER", "unknown")
-    text = get_text()
-
-    payload = json.dumps({"phone": phone, "content": text}).encode("utf-8")
-    log(f"-> phone={phone} content={text!r}")
-
-    req = urllib.request.Request(
-        MAC_URL,
-        data=payload,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
+    env = {k: v for k, v in os.environ.items() if k.startswith(("SMS_", "DECODED_"))}
+    data = json.dumps({"env": env, "args": sys.argv[1:], "received": time.time()}).encode("utf-8")
 
     try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            log(f"<- HTTP {resp.status} {resp.read().decode()}")
-    except urllib.error.HTTPError as e:
-        log(f"<- HTTP {e.code} {e.read().decode()}")
-    except urllib.error.URLError as e:
-        log(f"<- FAILED {e.reason}")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(2)
+            s.connect(SOCKET_PATH)
+            s.sendall(data)
+    except OSError:
+        try:
+            spool(data)
+        except OSError as e:
+            print(f"on_receive: could not spool message: {e}", file=sys.stderr)
 
     # Always exit 0 so gammu-smsd doesn't treat this as a processing failure
     sys.exit(0)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,435 @@
+"""
+SMS PDU helpers (3GPP TS 23.038 / 23.040) for AT+CMGF=0.
+
+Encoding picks the GSM 7-bit default alphabet whenever the text fits (Danish
+æ/ø/å/Æ/Ø/Å are in it) and falls back to UCS2 otherwise. Texts too long for a
+single SMS are split into concatenated segments with a UDH header.
+Decoding handles incoming SMS-DELIVER PDUs, including their concatenation info,
+and SMS-STATUS-REPORTs (delivery reports for messages sent with TP-SRR set).
+"""
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+# GSM 03.38 default alphabet, indexed by septet value. 0x1B is the escape to the extension table.
+GSM7_BASIC = (
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENSION = {
+    "\f": 0x0A, "^": 0x14, "{": 0x28, "}": 0x29, "\\": 0x2F,
+    "[": 0x3C, "~": 0x3D, "]": 0x3E, "|": 0x40, "€": 0x65,
+}
+_GSM7_INDEX = {c: i for i, c in enumerate(GSM7_BASIC) if c != "\x1b"}
+_GSM7_EXTENSION_CHARS = {v: c for c, v in GSM7_EXTENSION.items()}
+
+# Payload sizes: single message / segment of a concatenated message (6-byte UDH).
+GSM7_SINGLE, GSM7_SEGMENT = 160, 153
+UCS2_SINGLE, UCS2_SEGMENT = 70, 67
+
+DCS_GSM7 = 0x00
+DCS_UCS2 = 0x08
+
+# TP-ST ranges (23.040 9.2.3.15): done, SMSC still trying, given up (permanent / temporary error)
+ST_DELIVERED = 0x00
+ST_RETRYING = 0x20
+ST_FAILED = 0x40
+ST_FAILED_TEMPORARY = 0x60
+
+
+def is_gsm7(text: str) -> bool:
+    return all(c in _GSM7_INDEX or c in GSM7_EXTENSION for c in text)
+
+
+def _gsm7_septets(text: str) -> List[int]:
+    septets: List[int] = []
+    for c in text:
+        if c in _GSM7_INDEX:
+            septets.append(_GSM7_INDEX[c])
+        else:
+            septets.extend((0x1B, GSM7_EXTENSION[c]))
+    return septets
+
+
+def pack_septets(septets: List[int], fill_bits: int = 0) -> bytes:
+    """
+    Pack 7-bit values into octets, LSB first. `fill_bits` leading zero bits align
+    the text to a septet boundary after a UDH.
+    """
+    out = bytearray()
+    acc = 0
+    nbits = fill_bits
+    for s in septets:
+        acc |= (s & 0x7F) << nbits
+        nbits += 7
+        while nbits >= 8:
+            out.append(acc & 0xFF)
+            acc >>= 8
+            nbits -= 8
+    if nbits:
+        out.append(acc & 0xFF)
+    return bytes(out)
+
+
+def split_text(text: str) -> Tuple[int, List[str]]:
+    """
+    Choose the encoding for `text` and split it into SMS segments.
+    Returns (dcs, segments). GSM-7 escape pairs and UTF-16 surrogate pairs are
+    never split across segments.
+    """
+    if is_gsm7(text):
+        dcs, single, segment = DCS_GSM7, GSM7_SINGLE, GSM7_SEGMENT
+        size = lambda c: 1 if c in _GSM7_INDEX else 2
+    else:
+        dcs, single, segment = DCS_UCS2, UCS2_SINGLE, UCS2_SEGMENT
+        size = lambda c: 2 if ord(c) > 0xFFFF else 1
+
+    if sum(size(c) for c in text) <= single:
+        return dcs, [text]
+
+    segments: List[str] = []
+    current, used = "", 0
+    for c in text:
+        n = size(c)
+        if used + n > segment:
+            segments.append(current)
+            current, used = "", 0
+        current += c
+        used += n
+    if current:
+        segments.append(current)
+    return dcs, segments
+
+
+def _encode_address(number: str) -> str:
+    """
+    TP-DA: length in digits, type-of-address, semi-octet digits.
+    """
+    digits = number.strip()
+    toa = 0x81  # unknown numbering plan
+    if digits.startswith("+"):
+        digits, toa = digits[1:], 0x91  # international
+    digits = "".join(c for c in digits if c.isdigit())
+    padded = digits + ("F" if len(digits) % 2 else "")
+    swapped = "".join(padded[i + 1] + padded[i] for i in range(0, len(padded), 2))
+    return f"{len(digits):02X}{toa:02X}{swapped}"
+
+
+def _user_data(text: str, dcs: int, udh: bytes) -> Tuple[int, bytes]:
+    """
+    TP-UDL and TP-UD for `text`, with an optional UDH (without its length octet).
+    """
+    if udh:
+        udh = bytes([len(udh)]) + udh
+
+    if dcs == DCS_GSM7:
+        septets = _gsm7_septets(text)
+        udh_bits = len(udh) * 8
+        fill = (7 - udh_bits % 7) % 7
+        return (udh_bits + fill) // 7 + len(septets), udh + pack_septets(septets, fill)
+
+    ud = udh + text.encode("utf-16-be")
+    return len(ud), ud
+
+
+def encode_submit(
+    number: str,
+    text: str,
+    dcs: int,
+    udh: bytes = b"",
+    status_report: bool = False,
+) -> Tuple[str, int]:
+    """
+    Build one SMS-SUBMIT PDU. Returns (hex_pdu, tpdu_length) where tpdu_length is
+    the value AT+CMGS=<length> expects (octets after the SMSC part).
+    """
+    first_octet = 0x11  # SMS-SUBMIT, relative validity period present
+    if udh:
+        first_octet |= 0x40  # TP-UDHI
+    if status_report:
+        first_octet |= 0x20  # TP-SRR
+
+    udl, ud = _user_data(text, dcs, udh)
+    tpdu = (
+        f"{first_octet:02X}"
+        "00"                    # TP-MR, set by the modem
+        f"{_encode_address(number)}"
+        "00"                    # TP-PID
+        f"{dcs:02X}"
+        "AA"                    # TP-VP: 4 days
+        f"{udl:02X}"
+        f"{ud.hex().upper()}"
+    )
+    # "00": use the SMSC stored on the SIM
+    return "00" + tpdu, len(tpdu) // 2
+
+
+def _encode_timestamp(scts: str) -> str:
+    """
+    "yy/MM/dd,hh:mm:ss+zz" -> TP-SCTS semi-octets.
+    """
+    date, time_tz = scts.split(",")
+    sign = -1 if "-" in time_tz else 1
+    clock, quarters = time_tz.replace("-", "+").split("+")
+    digits = date.split("/") + clock.split(":")
+    out = "".join(d[1] + d[0] for d in digits)
+    tz = int(quarters)
+    tz_octet = ((tz % 10) << 4) | (tz // 10) | (0x08 if sign < 0 else 0)
+    return out + f"{tz_octet:02X}"
+
+
+def encode_deliver(
+    number: str,
+    text: str,
+    dcs: int,
+    scts: str,
+    udh: bytes = b"",
+) -> str:
+    """
+    Build one SMS-DELIVER PDU, as the modem would list it. Used to produce
+    recorded-style listings for benchmarks and the modem emulator.
+    """
+    first_octet = 0x04  # SMS-DELIVER, no more messages to send
+    if udh:
+        first_octet |= 0x40
+    udl, ud = _user_data(text, dcs, udh)
+    return (
+        "00"                    # no SMSC info
+        f"{first_octet:02X}"
+        f"{_encode_address(number)}"
+        "00"
+        f"{dcs:02X}"
+        f"{_encode_timestamp(scts)}"
+        f"{udl:02X}"
+        f"{ud.hex().upper()}"
+    )
+
+
+def encode_status_report(number: str, reference: int, status: int, scts: str, discharge: str) -> str:
+    """
+    Build one SMS-STATUS-REPORT PDU, as the modem would route it in +CDS.
+    Used by the modem emulator.
+    """
+    return (
+        "00"                    # no SMSC info
+        "06"                    # SMS-STATUS-REPORT, no more messages to send
+        f"{reference & 0xFF:02X}"
+        f"{_encode_address(number)}"
+        f"{_encode_timestamp(scts)}"
+        f"{_encode_timestamp(discharge)}"
+        f"{status:02X}"
+    )
+
+
+def encode_message(
+    number: str,
+    text: str,
+    status_report: bool = False,
+    reference: Optional[int] = None,
+) -> List[Tuple[str, int]]:
+    """
+    Encode `text` as one or more SMS-SUBMIT PDUs (concatenated with an 8-bit
+    reference UDH when it does not fit in one SMS).
+    """
+    dcs, segments = split_text(text)
+    if len(segments) == 1:
+        return [encode_submit(number, segments[0], dcs, status_report=status_report)]
+
+    ref = random.randint(0, 255) if reference is None else reference & 0xFF
+    total = len(segments)
+    return [
+        encode_submit(
+            number,
+            segment,
+            dcs,
+            udh=bytes([0x00, 0x03, ref, total, part]),
+            status_report=status_report,
+        )
+        for part, segment in enumerate(segments, start=1)
+    ]
+
+
+# ---------- DECODING ----------
+
+def unpack_septets(data: bytes, count: int, fill_bits: int = 0) -> List[int]:
+    """
+    Inverse of pack_septets: read `count` 7-bit values after skipping `fill_bits`.
+    """
+    septets: List[int] = []
+    acc = 0
+    nbits = 0
+    skip = fill_bits
+    for octet in data:
+        acc |= octet << nbits
+        nbits += 8
+        if skip:
+            acc >>= skip
+            nbits -= skip
+            skip = 0
+        while nbits >= 7 and len(septets) < count:
+            septets.append(acc & 0x7F)
+            acc >>= 7
+            nbits -= 7
+        if len(septets) >= count:
+            break
+    return septets
+
+
+def decode_gsm7(septets: List[int]) -> str:
+    out = []
+    escape = False
+    for s in septets:
+        if escape:
+            out.append(_GSM7_EXTENSION_CHARS.get(s, " "))
+            escape = False
+        elif s == 0x1B:
+            escape = True
+        else:
+            out.append(GSM7_BASIC[s])
+    return "".join(out)
+
+
+def _semi_octets(data: bytes) -> str:
+    return "".join(f"{b & 0x0F:X}{b >> 4:X}" for b in data).rstrip("F")
+
+
+def _decode_address(data: bytes, pos: int) -> Tuple[str, int]:
+    """
+    Decode a TP-OA/TP-RA address at `pos`. Returns (number, next_pos).
+    """
+    ndigits = data[pos]
+    toa = data[pos + 1]
+    nbytes = (ndigits + 1) // 2
+    raw = data[pos + 2:pos + 2 + nbytes]
+    if toa & 0x70 == 0x50:
+        # Alphanumeric sender ("Telenor", ...) packed as GSM-7
+        number = decode_gsm7(unpack_septets(raw, ndigits * 4 // 7))
+    else:
+        number = _semi_octets(raw)[:ndigits]
+        if toa & 0x70 == 0x10:
+            number = "+" + number
+    return number, pos + 2 + nbytes
+
+
+def _decode_timestamp(data: bytes) -> str:
+    """
+    TP-SCTS -> "yy/MM/dd,hh:mm:ss+zz" (zz in quarter hours), the same format
+    text mode reports.
+    """
+    fields = [f"{b & 0x0F}{b >> 4}" for b in data[:6]]
+    tz = data[6]
+    quarters = (tz & 0x07) * 10 + (tz >> 4)
+    sign = "-" if tz & 0x08 else "+"
+    return f"{fields[0]}/{fields[1]}/{fields[2]},{fields[3]}:{fields[4]}:{fields[5]}{sign}{quarters:02d}"
+
+
+def _alphabet(dcs: int) -> str:
+    if dcs & 0xC0 == 0x00:
+        return ("gsm7", "8bit", "ucs2", "gsm7")[(dcs >> 2) & 0x03]
+    if dcs & 0xF0 == 0xF0:
+        return "8bit" if dcs & 0x04 else "gsm7"
+    if dcs & 0xF0 == 0xE0:
+        return "ucs2"
+    return "gsm7"
+
+
+def _parse_udh(udh: bytes) -> Optional[Tuple[int, int, int]]:
+    """
+    Extract (reference, total, part) from a concatenation IE, if present.
+    """
+    i = 0
+    while i + 1 < len(udh):
+        iei, length = udh[i], udh[i + 1]
+        value = udh[i + 2:i + 2 + length]
+        if iei == 0x00 and length == 3:
+            return value[0], value[1], value[2]
+        if iei == 0x08 and length == 4:
+            return (value[0] << 8) | value[1], value[2], value[3]
+        i += 2 + length
+    return None
+
+
+def decode_deliver(pdu_hex: str) -> Dict[str, Any]:
+    """
+    Decode an SMS-DELIVER PDU (as listed by AT+CMGL/AT+CMGR in PDU mode).
+    Returns {"phone", "createdAt", "content", "concat"} where concat is
+    (reference, total, part) for a segment of a long message, else None.
+    """
+    data = bytes.fromhex(pdu_hex.strip())
+    pos = 1 + data[0]  # skip SMSC info
+    first_octet = data[pos]
+    pos += 1
+    phone, pos = _decode_address(data, pos)
+    dcs = data[pos + 1]
+    pos += 2  # PID, DCS
+    created_at = _decode_timestamp(data[pos:pos + 7])
+    pos += 7
+    udl = data[pos]
+    ud = data[pos + 1:]
+
+    concat = None
+    header_len = 0
+    if first_octet & 0x40:
+        header_len = ud[0] + 1
+        concat = _parse_udh(ud[1:header_len])
+
+    alphabet = _alphabet(dcs)
+    if alphabet == "gsm7":
+        header_bits = header_len * 8
+        fill = (7 - header_bits % 7) % 7
+        count = udl - (header_bits + fill) // 7
+        content = decode_gsm7(unpack_septets(ud[header_len:], count, fill))
+    elif alphabet == "ucs2":
+        content = ud[header_len:udl].decode("utf-16-be", errors="replace")
+    else:
+        content = ud[header_len:udl].decode("latin-1")
+
+    return {"phone": phone, "createdAt": created_at, "content": content, "concat": concat}
+
+
+def decode_submit_header(pdu_hex: str) -> Dict[str, Any]:
+    """
+    Recipient and TP-SRR of an SMS-SUBMIT PDU (what AT+CMGS is given).
+    Used by the modem emulator.
+    """
+    data = bytes.fromhex(pdu_hex.strip())
+    pos = 1 + data[0]  # skip SMSC info
+    first_octet = data[pos]
+    phone, _ = _decode_address(data, pos + 2)  # after TP-MR
+    return {"phone": phone, "status_report": bool(first_octet & 0x20)}
+
+
+def report_outcome(status: int) -> str:
+    """
+    TP-ST -> "delivered", "pending" (the SMSC keeps trying) or "failed".
+    """
+    if status < ST_RETRYING:
+        return "delivered"
+    if status < ST_FAILED:
+        return "pending"
+    return "failed"
+
+
+def decode_status_report(pdu_hex: str) -> Dict[str, Any]:
+    """
+    Decode an SMS-STATUS-REPORT PDU (+CDS in PDU mode).
+    Returns {"reference", "phone", "createdAt", "discharged", "st", "outcome"}:
+    reference is the TP-MR of the submit it reports on, createdAt when the
+    SMSC accepted that submit, discharged when it was delivered (or given up).
+    """
+    data = bytes.fromhex(pdu_hex.strip())
+    pos = 1 + data[0]  # skip SMSC info
+    if data[pos] & 0x03 != 0x02:
+        raise ValueError("not an SMS-STATUS-REPORT")
+    reference = data[pos + 1]
+    phone, pos = _decode_address(data, pos + 2)
+    created_at = _decode_timestamp(data[pos:pos + 7])
+    discharged = _decode_timestamp(data[pos + 7:pos + 14])
+    status = data[pos + 14]
+    return {
+        "reference": reference,
+        "phone": phone,
+        "createdAt": created_at,
+        "discharged": discharged,
+        "st": status,
+        "outcome": report_outcome(status),
+    }
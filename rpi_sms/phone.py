@@ -0,0 +1,62 @@
+"""
+Canonical phone number keys.
+
+The same number arrives in several shapes: "+4552228856" from CMGL,
+"52228856" from /send, "004552228856" from gammu, "002B0034..." when the
+modem is in UCS2 character set. phone_key() turns all of them into one
+E.164 string ("+4552228856") so lookups are a plain equality match.
+
+National numbers get DEFAULT_COUNTRY (SMS_DEFAULT_COUNTRY, calling code
+without "+"). Short codes and alphanumeric senders ("1272", "MitID") are no
+phone numbers and are kept as they are, minus surrounding whitespace.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Optional
+
+DEFAULT_COUNTRY = os.environ.get("SMS_DEFAULT_COUNTRY", "45")
+CACHE_SIZE = 4096
+
+MIN_NATIONAL = 6   # shorter than this is a short code, not a subscriber number
+MAX_DIGITS = 15    # E.164: country code + national number
+
+_SEPARATORS = re.compile(r"[\s\-.()/]")
+_UCS2_DIGITS = re.compile(r"(?:00(?:2B|3[0-9]))+", re.IGNORECASE)
+
+
+def _decode_ucs2(raw: str) -> str:
+    # "002B0034" -> "+4"; only when every code unit is a digit or '+'
+    if len(raw) >= 8 and len(raw) % 4 == 0 and _UCS2_DIGITS.fullmatch(raw):
+        return bytes.fromhex(raw).decode("utf-16-be")
+    return raw
+
+
+def normalize(raw: str, country: str = DEFAULT_COUNTRY) -> Optional[str]:
+    """
+    E.164 form of `raw`, or None when it is not a phone number.
+    """
+    number = _decode_ucs2(_SEPARATORS.sub("", raw))
+    if number.startswith("+"):
+        digits = number[1:]
+    elif number.startswith("00"):
+        digits = number[2:]
+    else:
+        if not number.isdigit() or len(number) < MIN_NATIONAL:
+            return None
+        # Trunk prefix ("0" in most of Europe) is dropped in international form
+        digits = country + (number[1:] if number.startswith("0") else number)
+    if not digits.isdigit() or not 7 <= len(digits) <= MAX_DIGITS or digits[0] == "0":
+        return None
+    return "+" + digits
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def phone_key(raw: str, country: str = DEFAULT_COUNTRY) -> str:
+    """
+    Canonical key for `raw`: the E.164 number, or the trimmed input for short
+    codes and alphanumeric senders. Cached; the same few numbers repeat.
+    """
+    if not isinstance(raw, str):
+        return raw
+    return normalize(raw, country) or raw.strip()
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from send_queue import classify_send_error
+from sms import SMSHandler
+
+MAX_ERRORS = 3        # consecutive failed sends before a modem is taken out of rotation
+COOLDOWN = 300.0      # seconds out of rotation; the next send after that is the probe
+STICKY_MAX = 10000    # recipients remembered for sticky routing
+
+
+class _Modem:
+    def __init__(self, name: str, handler: SMSHandler):
+        self.name = name
+        self.handler = handler
+        self.inflight = 0          # sends waiting for or holding this modem
+        self.errors = 0            # consecutive transient failures
+        self.disabled_until = 0.0
+        self.sent = 0
+        self.failed = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.disabled_until
+
+
+class ModemPool:
+    """
+    Several SMSHandlers (one per serial port) behind one send_sms().
+
+    - each send goes to the healthy modem with the fewest sends in flight
+    - sticky=True keeps a recipient on the modem that first texted them, so a
+      conversation stays on one number; while that modem is out of rotation
+      the recipient is served by another one without being remapped
+    - MAX_ERRORS consecutive transient failures (timeouts, modem errors; not
+      permanent +CMS ERRORs like a bad number) take a modem out of rotation for
+      COOLDOWN seconds; its first send afterwards decides whether it stays in
+
+    send_sms() blocks like SMSHandler.send_sms(), so N callers (e.g. a SendQueue
+    with workers=N) keep N modems busy at once. The pool also offers read_sms,
+    clear_sms_storage and delete_read_messages over all modems, which is what
+    AsyncSMSHandler needs.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, SMSHandler],
+        sticky: bool = True,
+        max_errors: int = MAX_ERRORS,
+        cooldown: float = COOLDOWN,
+    ):
+        if not handlers:
+            raise ValueError("ModemPool needs at least one modem")
+        self.modems = [_Modem(name, handler) for name, handler in handlers.items()]
+        self._by_name = {m.name: m for m in self.modems}
+        self.sticky = sticky
+        self.max_errors = max_errors
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._sticky: "OrderedDict[str, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.modems)
+
+    def handler(self, name: str) -> SMSHandler:
+        return self._by_name[name].handler
+
+    # ---------- ROUTING ----------
+
+    def _acquire(self, phone: str) -> Optional[_Modem]:
+        with self._lock:
+            now = time.monotonic()
+            healthy = [m for m in self.modems if m.healthy(now)]
+            if not healthy:
+                return None
+
+            modem = None
+            if self.sticky and phone in self._sticky:
+                preferred = self._by_name[self._sticky[phone]]
+                self._sticky.move_to_end(phone)
+                if preferred.healthy(now):
+                    modem = preferred
+            if modem is None:
+                # Least loaded; fewer recent errors and fewer sends so far break ties
+                modem = min(healthy, key=lambda m: (m.inflight, m.errors, m.sent))
+                if self.sticky and phone not in self._sticky:
+                    self._sticky[phone] = modem.name
+                    if len(self._sticky) > STICKY_MAX:
+                        self._sticky.popitem(last=False)
+            modem.inflight += 1
+            return modem
+
+    def _release(self, modem: _Modem, result: Dict[str, Any]) -> None:
+        with self._lock:
+            modem.inflight -= 1
+            if result.get("success"):
+                modem.sent += 1
+                modem.errors = 0
+                return
+            modem.failed += 1
+            if classify_send_error(result) == "permanent":
+                return  # The recipient's problem, not the modem's
+            modem.errors += 1
+            if modem.errors >= self.max_errors:
+                modem.disabled_until = time.monotonic() + self.cooldown
+                print(
+                    f"[SMS Pool] {modem.name} out of rotation for {self.cooldown:.0f} s "
+                    f"after {modem.errors} failed sends"
+                )
+
+    # ---------- SEND ----------
+
+    def send_sms(self, phone_number: str, message: str) -> Dict[str, Any]:
+        modem = self._acquire(phone_number)
+        if modem is None:
+            return {
+                "success": False,
+                "status": "error",
+                "to": phone_number,
+                "message": message,
+                "error": "no modem in rotation",
+            }
+        result: Dict[str, Any] = {"success": False, "status": "exception"}
+        try:
+            result = modem.handler.send_sms(phone_number, message)
+        finally:
+            self._release(modem, result)
+        result["modem"] = modem.name
+        return result
+
+    # ---------- RECEIVE & MAINTENANCE ----------
+
+    def set_callback(self, callback_fn: Callable[[dict], None]) -> None:
+        """Incoming messages from every modem, tagged with the receiving modem's name."""
+        for m in self.modems:
+            m.handler.set_callback(lambda msg, name=m.name: callback_fn({**msg, "modem": name}))
+
+    def set_report_callback(self, callback_fn: Callable[[dict], None]) -> None:
+        """Delivery outcomes from every modem, tagged with the sending modem's name."""
+        for m in self.modems:
+            m.handler.set_report_callback(lambda report, name=m.name: callback_fn({**report, "modem": name}))
+
+    def start_receiver_thread(self, **poll_options: float) -> None:
+        """Adaptive receive poll on every modem; options as SMSHandler.start_receiver_thread."""
+        for m in self.modems:
+            m.handler.start_receiver_thread(**poll_options)
+
+    def read_sms(self, include_read: bool = False) -> List[dict]:
+        messages: List[dict] = []
+        for m in self.modems:
+            messages.extend({**msg, "modem": m.name} for msg in m.handler.read_sms(include_read))
+        return messages
+
+    def clear_sms_storage(self) -> Dict[str, Any]:
+        return {m.name: m.handler.clear_sms_storage() for m in self.modems}
+
+    def delete_read_messages(self) -> Dict[str, Any]:
+        return {m.name: m.handler.delete_read_messages() for m in self.modems}
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "modem": m.name,
+                    "in_rotation": m.healthy(now),
+                    "retry_in": max(0.0, round(m.disabled_until - now, 1)),
+                    "inflight": m.inflight,
+                    "consecutive_errors": m.errors,
+                    "sent": m.sent,
+                    "failed": m.failed,
+                    "scheduler": m.handler.scheduler.stats(),
+                }
+                for m in self.modems
+            ]
+
+    def close(self) -> None:
+        for m in self.modems:
+            m.handler.close()
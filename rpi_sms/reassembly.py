@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+# Parts of one long SMS can arrive minutes apart; after this we give up waiting.
+PART_TIMEOUT = 15 * 60.0
+MAX_PENDING = 64
+
+
+class ConcatBuffer:
+    """
+    Bounded reassembly buffer for concatenated SMS.
+    Parts are keyed by (phone, reference, total). add() returns the full message
+    once every part is present. Incomplete messages are released as partial
+    ("partial": True) when they time out or are evicted to stay within
+    `max_pending`, so a lost part never swallows the rest of the text.
+    """
+
+    def __init__(self, timeout: float = PART_TIMEOUT, max_pending: int = MAX_PENDING):
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # key -> (first_seen, {part_number: msg})
+        self._pending: "OrderedDict[Tuple[str, int, int], Tuple[float, Dict[int, dict]]]" = OrderedDict()
+
+    def add(self, msg: dict) -> List[dict]:
+        """
+        Feed one decoded message. Returns the messages that are ready for
+        delivery: the message itself if it is not a segment, a reassembled
+        message when this was the last missing part, plus anything that expired.
+        """
+        ready = self.expire()
+        concat = msg.get("concat")
+        if not concat:
+            ready.append(msg)
+            return ready
+
+        ref, total, part = concat
+        key = (msg["phone"], ref, total)
+        with self._lock:
+            if key not in self._pending:
+                self._pending[key] = (time.monotonic(), {})
+            parts = self._pending[key][1]
+            parts[part] = msg
+
+            if len(parts) >= total:
+                del self._pending[key]
+                ready.append(self._join(parts, partial=False))
+            while len(self._pending) > self.max_pending:
+                _, (_, oldest) = self._pending.popitem(last=False)
+                ready.append(self._join(oldest, partial=True))
+        return ready
+
+    def expire(self) -> List[dict]:
+        """
+        Release incomplete messages older than `timeout`.
+        """
+        now = time.monotonic()
+        expired: List[dict] = []
+        with self._lock:
+            for key in list(self._pending):
+                first_seen, parts = self._pending[key]
+                if now - first_seen < self.timeout:
+                    # OrderedDict is in arrival order, so the rest are newer
+                    break
+                del self._pending[key]
+                expired.append(self._join(parts, partial=True))
+        return expired
+
+    def pending_indexes(self) -> List[int]:
+        """Storage indexes of parts still waiting for the rest of their message."""
+        with self._lock:
+            return [
+                part["index"]
+                for _, parts in self._pending.values()
+                for part in parts.values()
+                if part.get("index") is not None
+            ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    @staticmethod
+    def _join(parts: Dict[int, dict], partial: bool) -> dict:
+        ordered = [parts[n] for n in sorted(parts)]
+        first = ordered[0]
+        msg = {
+            "index": first.get("index"),
+            "indexes": [p.get("index") for p in ordered],
+            "status": first.get("status"),
+            "phone": first["phone"],
+            "createdAt": first["createdAt"],
+            "content": "".join(p["content"] for p in ordered),
+            "parts": len(ordered),
+        }
+        if partial:
+            msg["partial"] = True
+        return msg
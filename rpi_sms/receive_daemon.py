@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Resident receiver for gammu-smsd.
+
+on_receive.py (gammu-smsd's RunOnReceive) no longer posts anything itself: it
+writes the SMS_*/DECODED_* environment to this daemon's Unix socket and exits.
+The daemon batches what arrives, journals it and forwards it to the webhook
+through the on-disk outbox, so a burst of messages costs one resident process
+instead of one interpreter and one blocking HTTP request per SMS.
+
+If the daemon is not running, on_receive.py leaves the payload in SPOOL_DIR;
+it is picked up on the next start (and on every idle rescan).
+
+Run:
+  python3 receive_daemon.py
+as the gammu-smsd user (or a user in its group), e.g. from a systemd unit.
+"""
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from journal import MessageJournal
+from phone import phone_key
+from webhook import WebhookDispatcher
+
+SOCKET_PATH = "/tmp/sms-receive.sock"
+SPOOL_DIR = "/home/pi/sms-spool"
+LOGFILE = "/home/pi/sms-webhook.log"
+MAC_URL = "http://rubensmac.com:3000/api/receive-sms-webhook"
+OUTBOX_DIR = "gammu_webhook_outbox"
+
+BATCH_WINDOW = 0.2   # seconds to keep collecting after the first message of a burst
+BATCH_MAX = 100
+SPOOL_SCAN = 30.0    # seconds between spool rescans while idle
+
+_log_file = None
+
+
+def log(msg: str) -> None:
+    global _log_file
+    if _log_file is None:
+        _log_file = open(LOGFILE, "a", buffering=1, encoding="utf-8")
+    _log_file.write(f"{datetime.now():%F %T} {msg}\n")
+
+
+def get_text(env: dict) -> str:
+    numparts = int(env.get("DECODED_PARTS", "0") or 0)
+    if numparts == 0:
+        return env.get("SMS_1_TEXT", "")
+    return "".join(env.get(f"DECODED_{i}_TEXT", "") for i in range(1, numparts + 1))
+
+
+def parse_payload(data: bytes) -> Optional[dict]:
+    """
+    Turn what on_receive.py sent into the message dict the rest of the code
+    uses. The client's spawn time stands in for the modem timestamp, which
+    gammu does not pass to RunOnReceive; it is only one-second resolution, so
+    the gammu inbox ids (unique per received message) key the journal row.
+    """
+    try:
+        payload = json.loads(data.decode("utf-8"))
+        env = payload["env"]
+    except (ValueError, KeyError, TypeError) as e:
+        log(f"!! bad payload: {e}")
+        return None
+    received = payload.get("received") or time.time()
+    ids = payload.get("args", [])
+    return {
+        "phone": phone_key(env.get("SMS_1_NUMBER", "unknown")),
+        "createdAt": time.strftime("%y/%m/%d,%H:%M:%S", time.localtime(received)),
+        "content": get_text(env),
+        "ids": ids,
+        "key": " ".join(ids) or None,
+    }
+
+
+class ReceiveDaemon:
+    """
+    - a Unix socket server reads one JSON payload per connection into a queue
+    - a single worker drains the queue in batches: one journal transaction per
+      batch, then every new message is handed to the webhook dispatcher
+    """
+
+    def __init__(
+        self,
+        socket_path: str = SOCKET_PATH,
+        spool_dir: str = SPOOL_DIR,
+        journal: Optional[MessageJournal] = None,
+        dispatcher: Optional[WebhookDispatcher] = None,
+    ):
+        self.socket_path = socket_path
+        self.spool_dir = spool_dir
+        self.journal = journal or MessageJournal()
+        self.dispatcher = dispatcher or WebhookDispatcher(MAC_URL, OUTBOX_DIR)
+        self._queue: "queue.Queue[bytes]" = queue.Queue()
+        self._stop = threading.Event()
+        self._server: Optional[socketserver.UnixStreamServer] = None
+
+    # ---------- SOCKET ----------
+
+    def _make_server(self) -> socketserver.UnixStreamServer:
+        incoming = self._queue
+
+        class Handler(socketserver.StreamRequestHandler):
+            timeout = 5.0
+
+            def handle(self):
+                data = self.rfile.read()
+                if data:
+                    incoming.put(data)
+
+        if os.path.exists(self.socket_path):
+            # Left behind by a previous run
+            os.unlink(self.socket_path)
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        server.daemon_threads = True
+        os.chmod(self.socket_path, 0o660)
+        return server
+
+    # ---------- SPOOL ----------
+
+    def _drain_spool(self) -> None:
+        try:
+            names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith(".json"))
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.spool_dir, name)
+            try:
+                with open(path, "rb") as f:
+                    self._queue.put(f.read())
+                os.remove(path)
+            except OSError as e:
+                log(f"!! could not read spooled {name}: {e}")
+        if names:
+            log(f"picked up {len(names)} spooled message(s)")
+
+    # ---------- WORKER ----------
+
+    def _next_batch(self) -> List[bytes]:
+        try:
+            batch = [self._queue.get(timeout=SPOOL_SCAN)]
+        except queue.Empty:
+            self._drain_spool()
+            return []
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch: List[bytes]) -> None:
+        msgs = [m for m in (parse_payload(data) for data in batch) if m is not None]
+        if not msgs:
+            return
+        rowids = self.journal.record_inbound_many(msgs)
+        for msg, rowid in zip(msgs, rowids):
+            ids = msg.pop("ids")
+            msg.pop("key")
+            if rowid is None:
+                log(f"== duplicate from {msg['phone']} {ids}, skipped")
+                continue
+            log(f"-> phone={msg['phone']} content={msg['content']!r} {ids}")
+            try:
+                self.dispatcher.enqueue(msg)
+            except OSError as e:
+                log(f"!! could not queue webhook: {e}")
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+    # ---------- LIFECYCLE ----------
+
+    def start(self) -> None:
+        self._drain_spool()
+        self.dispatcher.start()
+        threading.Thread(target=self._worker, name="receive-batcher", daemon=True).start()
+        self._server = self._make_server()
+        threading.Thread(target=self._server.serve_forever, name="receive-socket", daemon=True).start()
+        log(f"receive daemon listening on {self.socket_path}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            os.unlink(self.socket_path)
+        self.dispatcher.stop()
+
+
+def main() -> None:
+    daemon = ReceiveDaemon()
+    daemon.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+# Lower runs first. User-facing work (sends, raw commands, modem re-init) beats the
+# background receive poll, which beats storage maintenance.
+PRIORITY_SEND = 0
+PRIORITY_POLL = 1
+PRIORITY_MAINTENANCE = 2
+PRIORITY_NAMES = {PRIORITY_SEND: "send", PRIORITY_POLL: "poll", PRIORITY_MAINTENANCE: "maintenance"}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The job was still queued when its deadline passed; it never touched the modem."""
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "priority", "deadline", "future", "queued_at")
+
+    def __init__(self, fn, args, kwargs, priority: int, deadline: Optional[float]):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.deadline = deadline
+        self.future: Future = Future()
+        self.queued_at = time.monotonic()
+
+
+class CommandScheduler:
+    """
+    Runs modem operations one at a time on a single thread, the most urgent
+    first, so a send never waits behind a queue of polls and deletes (only
+    behind the one operation already running). Jobs of the same priority run
+    in submission order.
+
+    - submit() returns a concurrent.futures.Future; cancel() on it drops the
+      job as long as it has not started
+    - a job with a deadline (seconds from submit) that has not started by then
+      fails with DeadlineExceeded instead of running late
+    - run() blocks for the result; called from a job already on the scheduler
+      thread it runs inline, so operations can be built from other operations
+    """
+
+    def __init__(self, name: str = "modem"):
+        self.name = name
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, int, _Job]] = []
+        self._seq = itertools.count()
+        self._stop = False
+        self._running: Optional[str] = None
+        self._counts = {label: _new_counts() for label in PRIORITY_NAMES.values()}
+        self._thread = threading.Thread(target=self._loop, name=f"sms-scheduler-{name}", daemon=True)
+        self._thread.start()
+
+    # ---------- SUBMIT ----------
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: int = PRIORITY_POLL,
+        deadline: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Future:
+        job = _Job(fn, args, kwargs, priority, None if deadline is None else time.monotonic() + deadline)
+        with self._cond:
+            if self._stop:
+                raise RuntimeError(f"scheduler {self.name} is stopped")
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._publish_depth()
+            self._cond.notify()
+        return job.future
+
+    def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: int = PRIORITY_POLL,
+        deadline: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, priority=priority, deadline=deadline, **kwargs).result()
+
+    # ---------- WORKER ----------
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    break
+                _, _, job = heapq.heappop(self._heap)
+                self._publish_depth()
+            self._execute(job)
+
+        # Stopped: nothing queued will run
+        with self._cond:
+            leftover, self._heap = self._heap, []
+            self._publish_depth()
+        for _, _, job in leftover:
+            job.future.cancel()
+
+    def _execute(self, job: _Job) -> None:
+        label = PRIORITY_NAMES.get(job.priority, str(job.priority))
+        counts = self._counts.setdefault(label, _new_counts())
+        if not job.future.set_running_or_notify_cancel():
+            counts["cancelled"] += 1
+            return
+        now = time.monotonic()
+        if job.deadline is not None and now > job.deadline:
+            counts["expired"] += 1
+            job.future.set_exception(DeadlineExceeded(f"{_job_name(job)} not started before its deadline"))
+            return
+
+        wait = now - job.queued_at
+        counts["done"] += 1
+        counts["wait_total"] += wait
+        counts["wait_max"] = max(counts["wait_max"], wait)
+        metrics.SCHEDULER_WAIT.observe(wait, self.name, label)
+
+        self._running = _job_name(job)
+        try:
+            job.future.set_result(job.fn(*job.args, **job.kwargs))
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            self._running = None
+
+    def _depth(self) -> Dict[str, int]:
+        # Caller holds self._cond
+        depth = {label: 0 for label in PRIORITY_NAMES.values()}
+        for priority, _, _ in self._heap:
+            label = PRIORITY_NAMES.get(priority, str(priority))
+            depth[label] = depth.get(label, 0) + 1
+        return depth
+
+    def _publish_depth(self) -> None:
+        for label, n in self._depth().items():
+            metrics.SCHEDULER_DEPTH.set(n, self.name, label)
+
+    # ---------- STATUS ----------
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per priority, and per priority how long jobs waited for the modem."""
+        with self._cond:
+            depth = self._depth()
+            running = self._running
+        jobs = {}
+        for label, c in self._counts.items():
+            jobs[label] = {
+                "done": c["done"],
+                "expired": c["expired"],
+                "cancelled": c["cancelled"],
+                "wait_avg": round(c["wait_total"] / c["done"], 4) if c["done"] else 0.0,
+                "wait_max": round(c["wait_max"], 4),
+            }
+        return {"running": running, "depth": depth, "jobs": jobs}
+
+    def stop(self) -> None:
+        """Finish the running job; cancel everything still queued."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+
+def _new_counts() -> Dict[str, float]:
+    return {"done": 0, "expired": 0, "cancelled": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+
+def _job_name(job: _Job) -> str:
+    return getattr(job.fn, "__name__", repr(job.fn))
@@ -0,0 +1,297 @@
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+
+SEND_QUEUE_DB = "send_queue.db"
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5.0    # seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 600.0
+
+# +CMS ERROR codes that will not go away by retrying: unassigned/barred numbers,
+# rejected or malformed messages, unsupported operations and SIM problems.
+PERMANENT_CMS_ERRORS = {
+    1, 8, 10, 21, 29, 50, 69, 96, 97, 98, 99,
+    302, 303, 304, 305, 310, 311, 312, 313, 316, 317, 318,
+}
+
+_JOB_COLUMNS = (
+    "id", "phone", "message", "status", "attempts", "cms_error",
+    "last_error", "created_at", "updated_at", "next_attempt_at",
+    "refs", "delivery", "delivered_at",
+)
+# Added after the first release; ALTER TABLE brings older databases up to date
+_ADDED_COLUMNS = {"refs": "TEXT", "delivery": "TEXT", "delivered_at": "REAL"}
+
+
+def classify_send_error(result: Dict[str, Any]) -> str:
+    """
+    "permanent" if the failed send should not be retried, "transient" otherwise.
+    Timeouts, exceptions and unknown errors are assumed transient.
+    """
+    code = result.get("cms_error")
+    if code is not None and code in PERMANENT_CMS_ERRORS:
+        return "permanent"
+    return "transient"
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+
+
+class SendQueue:
+    """
+    Persistent outbound SMS queue.
+    - enqueue() stores the job and returns immediately with its id
+    - worker threads (one per modem; see ModemPool) drain jobs to the modem in order
+    - jobs for a recipient go out one at a time and in enqueue order, even with
+      several workers: only the recipient's oldest queued job can be picked, so
+      a job waiting out its retry backoff holds back the ones behind it
+    - failed sends are retried with exponential backoff unless the +CMS ERROR is
+      permanent or part of a long message already went out
+    Job status: "queued" -> "sending" -> "sent" / "failed".
+    With delivery reports on, a sent job keeps its message references ("refs")
+    and record_delivery() sets "delivery" to "delivered" or "failed", then calls
+    on_delivery(job, report).
+    """
+
+    def __init__(
+        self,
+        send_fn: Callable[[str, str], Dict[str, Any]],
+        db_path: str = SEND_QUEUE_DB,
+        on_sent: Optional[Callable[[Dict[str, Any]], None]] = None,
+        workers: int = 1,
+        on_delivery: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+    ):
+        self.send_fn = send_fn
+        self.on_sent = on_sent
+        self.on_delivery = on_delivery
+        self.workers = workers
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS send_jobs (
+                id TEXT PRIMARY KEY,
+                phone TEXT NOT NULL,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                cms_error INTEGER,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                refs TEXT,
+                delivery TEXT,
+                delivered_at REAL
+            )
+            """
+        )
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(send_jobs)")}
+        for column, kind in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE send_jobs ADD COLUMN {column} {kind}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS send_jobs_refs ON send_jobs (phone, refs)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS send_jobs_due ON send_jobs (status, next_attempt_at)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS send_jobs_phone ON send_jobs (phone, status, created_at)"
+        )
+        # A job still "sending" was interrupted by a restart; try it again
+        self._db.execute("UPDATE send_jobs SET status = 'queued' WHERE status = 'sending'")
+        self._db.commit()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # Recipients with a job being sent right now
+        self._inflight: Set[str] = set()
+        # job id -> delivery reports that arrived while the job was still "sending"
+        self._early_reports: Dict[str, List[Dict[str, Any]]] = {}
+
+    # ---------- PUBLIC API ----------
+
+    def enqueue(self, phone: str, message: str) -> Dict[str, Any]:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._wakeup:
+            self._db.execute(
+                "INSERT INTO send_jobs (id, phone, message, status, created_at, updated_at, next_attempt_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, phone, message, now, now, now),
+            )
+            self._db.commit()
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_JOB_COLUMNS)} FROM send_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+    def record_delivery(self, report: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Store a final delivery outcome (see DeliveryTracker.report) on the sent
+        job it belongs to: the latest one to that number with those references.
+        A report can also beat the send's return. It is then held for the job
+        still "sending" to that number (there is at most one) and applied when
+        that attempt finishes with the same references, so a late report from
+        an earlier, failed attempt is dropped.
+        Returns the updated job, or None if no job matches (yet).
+        """
+        refs = ",".join(str(r) for r in report["references"])
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM send_jobs WHERE phone = ? AND refs = ? AND status = 'sent'"
+                " AND delivery IS NULL ORDER BY updated_at DESC LIMIT 1",
+                (report["to"], refs),
+            ).fetchone()
+            if row is None:
+                sending = self._db.execute(
+                    "SELECT id FROM send_jobs WHERE phone = ? AND status = 'sending'", (report["to"],)
+                ).fetchone()
+                if sending is not None:
+                    self._early_reports.setdefault(sending[0], []).append(report)
+                return None
+            self._store_delivery(row[0], report)
+        return self._delivered(row[0], report)
+
+    def depth(self) -> int:
+        """Number of jobs not yet sent or failed."""
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM send_jobs WHERE status IN ('queued', 'sending')"
+            ).fetchone()
+        return count
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"sms-send-queue-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    # ---------- WORKER ----------
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next due job and mark it "sending". Returns None on stop.
+        Candidates are each idle recipient's oldest queued job; a later job never
+        overtakes one that is waiting to be retried.
+        """
+        with self._wakeup:
+            while not self._stop.is_set():
+                now = time.time()
+                busy = ", ".join("?" * len(self._inflight))
+                row = self._db.execute(
+                    f"SELECT {', '.join(_JOB_COLUMNS)} FROM send_jobs AS j WHERE status = 'queued'"
+                    f" AND phone NOT IN ({busy})"
+                    " AND NOT EXISTS (SELECT 1 FROM send_jobs AS o WHERE o.phone = j.phone"
+                    " AND o.status = 'queued' AND (o.created_at < j.created_at"
+                    " OR (o.created_at = j.created_at AND o.rowid < j.rowid)))"
+                    " ORDER BY next_attempt_at, created_at LIMIT 1",
+                    tuple(self._inflight),
+                ).fetchone()
+                if row is None:
+                    self._wakeup.wait()
+                    continue
+                job = dict(zip(_JOB_COLUMNS, row))
+                if job["next_attempt_at"] > now:
+                    # Sleep until the retry is due, or until a new job arrives
+                    self._wakeup.wait(job["next_attempt_at"] - now)
+                    continue
+                self._db.execute(
+                    "UPDATE send_jobs SET status = 'sending', updated_at = ? WHERE id = ?",
+                    (now, job["id"]),
+                )
+                self._db.commit()
+                self._inflight.add(job["phone"])
+                return job
+        return None
+
+    def _store_delivery(self, job_id: str, report: Dict[str, Any]) -> None:
+        # Caller holds the lock
+        self._db.execute(
+            "UPDATE send_jobs SET delivery = ?, delivered_at = ? WHERE id = ?",
+            (report["status"], time.time(), job_id),
+        )
+        self._db.commit()
+
+    def _delivered(self, job_id: str, report: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        job = self.get(job_id)
+        if self.on_delivery:
+            try:
+                self.on_delivery(job, report)
+            except Exception as e:
+                print(f"[Send Queue] on_delivery hook failed: {e}")
+        return job
+
+    def _finish(self, job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        now = time.time()
+        attempts = job["attempts"] + 1
+        error = result.get("error") or result.get("raw_response")
+        refs = ",".join(str(r) for r in result.get("references") or []) or None
+
+        if result.get("success"):
+            status, next_attempt_at, error = "sent", now, None
+        elif result.get("sent_parts"):
+            # Some parts of a long message went out. A retry would send all of them
+            # again under a new concat reference, so the recipient would get the
+            # first parts twice and neither copy would reassemble.
+            status, next_attempt_at = "failed", now
+            error = f"only {result['sent_parts']} of {result.get('parts')} parts sent: {error}"
+        elif classify_send_error(result) == "permanent" or attempts >= MAX_ATTEMPTS:
+            status, next_attempt_at = "failed", now
+        else:
+            status, next_attempt_at = "queued", now + backoff_delay(attempts)
+
+        with self._lock:
+            self._db.execute(
+                "UPDATE send_jobs SET status = ?, attempts = ?, cms_error = ?, last_error = ?,"
+                " updated_at = ?, next_attempt_at = ?, refs = ? WHERE id = ?",
+                (status, attempts, result.get("cms_error"), error, now, next_attempt_at, refs, job["id"]),
+            )
+            self._db.commit()
+            early = None
+            if status == "sent":
+                early = next(
+                    (r for r in self._early_reports.get(job["id"], []) if r["references"] == result.get("references")),
+                    None,
+                )
+            self._early_reports.pop(job["id"], None)
+            if early is not None:
+                self._store_delivery(job["id"], early)
+            self._inflight.discard(job["phone"])
+            # The recipient's next job may be due now
+            self._wakeup.notify_all()
+        if early is not None:
+            self._delivered(job["id"], early)
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                result = self.send_fn(job["phone"], job["message"])
+            except Exception as e:
+                result = {"success": False, "status": "exception", "error": str(e)}
+            self._finish(job, result)
+            print(f"[Send Queue] {job['id']} -> {self.get(job['id'])['status']}")
+            if result.get("success") and self.on_sent:
+                try:
+                    self.on_sent(job)
+                except Exception as e:
+                    print(f"[Send Queue] on_sent hook failed: {e}")
@@ -1,86 +1,459 @@
-import serial
 import time
+import queue
 import threading
-from typing import Callable, Optional, List, Dict, Any
+from dataclasses import dataclass, field
+from typing import Callable, Optional, List, Dict, Any, Set, Iterator, Tuple
+
+import metrics
+from delivery import DeliveryTracker
+from listing_parser import ListingParser
+from pdu import decode_status_report, encode_message
+from phone import phone_key
+from reassembly import ConcatBuffer
+from scheduler import PRIORITY_MAINTENANCE, PRIORITY_POLL, PRIORITY_SEND, CommandScheduler, DeadlineExceeded
+from transport import RecordingTransport, open_serial
 
 SERIAL_PORT = "/dev/serial0"
 BAUD_RATE = 9600
 
+# Final result codes that end an AT command response.
+FINAL_RESULT_CODES = ("OK", "ERROR")
+FINAL_ERROR_PREFIXES = ("+CMS ERROR:", "+CME ERROR:")
+PROMPT = ">"
+
+# Unsolicited result codes the modem can send at any time.
+URC_PREFIXES = ("+CMTI:", "+CDSI:", "+CDS:", "RING", "RDY", "Call Ready", "SMS Ready", "+CFUN:", "+CPIN:")
+# URCs the module sends after a (re)boot; all cached settings are gone at that point.
+RESET_URCS = ("RDY", "+CFUN:")
+
+# Settings the handler needs. Keys match the modem state cache.
+STORAGE = "SM_P"
+CNMI_SETTING = "2,1,0,0,0"
+# Same, plus status reports routed straight to us as +CDS (nothing stored on the SIM)
+CNMI_REPORTS = "2,1,0,1,0"
+
+# <stat> values for AT+CMGL in PDU mode
+PDU_STAT_UNREAD = 0
+PDU_STAT_READ = 1
+PDU_STAT_ALL = 4
+
+# Receive poll interval bounds (seconds): tight right after traffic, backing off when idle
+POLL_MIN_INTERVAL = 5.0
+POLL_MAX_INTERVAL = 60.0
+POLL_BACKOFF = 2.0
+
+
+@dataclass
+class ATResponse:
+    """
+    Structured result of one AT command.
+    - lines: intermediate response lines (echo and blank lines removed)
+    - status: final result code ("OK", "ERROR", "+CMS ERROR: 500", ">") or "TIMEOUT"
+    """
+    command: str
+    lines: List[str] = field(default_factory=list)
+    status: str = "TIMEOUT"
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("OK", PROMPT)
+
+    @property
+    def timed_out(self) -> bool:
+        return self.status == "TIMEOUT"
+
+    @property
+    def error_code(self) -> Optional[int]:
+        """Numeric code from +CMS ERROR / +CME ERROR, if any."""
+        for prefix in FINAL_ERROR_PREFIXES:
+            if self.status.startswith(prefix):
+                try:
+                    return int(self.status[len(prefix):].strip())
+                except ValueError:
+                    return None
+        return None
+
+    @property
+    def raw(self) -> str:
+        return "\r\n".join(self.lines + [self.status])
+
+
+def _is_final_line(line: str) -> bool:
+    return line in FINAL_RESULT_CODES or line.startswith(FINAL_ERROR_PREFIXES)
+
+
+def _is_urc(line: str, command: Optional[str]) -> bool:
+    """
+    True if `line` is an unsolicited result code. A line that answers the command
+    in flight (e.g. "+CPIN: READY" for "AT+CPIN?") is not treated as a URC.
+    """
+    if not line.startswith(URC_PREFIXES):
+        return False
+    if command:
+        name = line.split(":", 1)[0]
+        if name.startswith("+") and command.upper().startswith("AT" + name):
+            return False
+    return True
+
+
+def _command_name(command: str) -> str:
+    """Metric label for a command: "AT+CMGS=23" -> "AT+CMGS"; PDU payloads -> "PDU"."""
+    if command[:2].upper() != "AT":
+        return "PDU"
+    return command.split("=", 1)[0].rstrip("?")
+
+
+def _message_reference(resp: ATResponse) -> Optional[int]:
+    # "+CMGS: <mr>" after a successful submit
+    for line in resp.lines:
+        if line.startswith("+CMGS:"):
+            try:
+                return int(line[len("+CMGS:"):].split(",")[0])
+            except ValueError:
+                return None
+    return None
+
+
+def _observe_command(resp: ATResponse) -> None:
+    name = _command_name(resp.command)
+    metrics.AT_LATENCY.observe(resp.elapsed, name)
+    if not resp.ok:
+        metrics.AT_ERRORS.inc(name, resp.status)
+
+
+class _PendingCommand:
+    """A command waiting for its response; filled in by the reader thread."""
+
+    def __init__(self, command: str, expect_prompt: bool, parser: Optional[ListingParser] = None):
+        self.command = command
+        self.expect_prompt = expect_prompt
+        self.response = ATResponse(command=command)
+        self.done = threading.Event()
+        # Streaming listings: raw bytes go to `parser`, finished messages to `records`
+        self.parser = parser
+        self.records: "queue.Queue[dict]" = queue.Queue()
+
 
 class SMSHandler:
-    def __init__(self, port: str = SERIAL_PORT, baud: int = BAUD_RATE):
-        self.ser = serial.Serial(port, baud, timeout=1)
-        time.sleep(2)  # Allow GSM module to initialize
+    def __init__(
+        self,
+        port: str = SERIAL_PORT,
+        baud: int = BAUD_RATE,
+        transport=None,
+        capture: Optional[str] = None,
+        delivery_reports: bool = False,
+    ):
+        """
+        - transport: use this instead of opening `port`, e.g. a ReplayTransport
+        - capture: record all serial traffic to this file (see transport.py)
+        - delivery_reports: request a status report for every send and hand
+          final delivery outcomes to the report callback (set_report_callback)
+        """
+        if transport is None:
+            transport = open_serial(port, baud)
+            time.sleep(2)  # Allow GSM module to initialize
+        if capture:
+            transport = RecordingTransport(transport, capture)
+        self.ser = transport
         self.callback: Optional[Callable[[dict], None]] = None
-
-        self._init_modem()
+        self.report_callback: Optional[Callable[[dict], None]] = None
+        self.delivery_reports = delivery_reports
+        # Sends waiting for their status reports, by message reference
+        self.deliveries = DeliveryTracker()
+        # Holds segments of long messages until every part has arrived
+        self._concat = ConcatBuffer()
+        # Read messages whose callback failed: handed to the callback again on every
+        # poll until it takes them, and kept on the SIM (never bulk-deleted) meanwhile
+        self._failed: List[dict] = []
+        self._failed_lock = threading.Lock()
+        # Storage used-count as of the last listing, and the indexes read since;
+        # None means unknown, so the next poll lists (see poll_sms)
+        self._listed_used: Optional[int] = None
+        self._seen_indexes: Set[int] = set()
+        # Set whenever messages come in; tightens the receive poll interval
+        self._traffic = threading.Event()
+
+        # One command in flight at a time; RLock so multi-step exchanges (CMGS) can hold it
+        self._lock = threading.RLock()
+        self._pending: Optional[_PendingCommand] = None
+        self._stop = threading.Event()
+
+        # What we believe the modem is currently set to (echo, cmgf, cpms, cnmi).
+        # A missing key means "unknown"; the next _ensure() will send the command.
+        self._modem_state: Dict[str, Any] = {}
+
+        # URC prefix -> handler(line). Handlers run on the URC thread, never the reader thread,
+        # so they are free to send AT commands themselves.
+        self._urc_handlers: Dict[str, Callable[[str], None]] = {
+            "+CMTI:": self._on_cmti,
+            "+CDS:": self._on_status_report,
+        }
+        for prefix in RESET_URCS:
+            self._urc_handlers[prefix] = self._on_reset
+        self._urc_queue: "queue.Queue[str]" = queue.Queue()
+        # A +CDS header line waiting for its PDU line (reader thread only)
+        self._cds_header: Optional[str] = None
+
+        # Owns modem access: every public operation runs as a job here, most urgent first
+        self.scheduler = CommandScheduler(port)
+
+        threading.Thread(target=self._reader_loop, name="sms-reader", daemon=True).start()
+        threading.Thread(target=self._urc_loop, name="sms-urc", daemon=True).start()
+
+        self.scheduler.run(self._init_modem, priority=PRIORITY_SEND)
+
+    def close(self) -> None:
+        self._stop.set()
+        self.scheduler.stop()
+        self.ser.close()
 
     # ---------- MODEM INIT ----------
 
     def _init_modem(self) -> None:
         """
-        Run once. Sets:
-        - Text mode
-        - UCS2 charset (for æ,ø,å)
+        Run at start and after a modem reset. Sets:
+        - Echo off
+        - PDU mode (sending and receiving; see pdu.py)
         - Storage to SM_P
-        - New message indication (optional)
+        - New message indication
         """
         self._send_at_command("AT")
-        self._send_at_command("AT+CMGF=1")  # text mode
-        self._send_at_command('AT+CSCS="UCS2"')
-        self._send_at_command('AT+CPMS="SM_P","SM_P","SM_P"')
-        # URC for new SMS (you can later evolve this into a full listener)
-        self._send_at_command("AT+CNMI=2,1,0,0,0")
+        self._ensure("echo", False, "ATE0")
+        self._ensure_pdu_mode()
+        self._ensure_storage()
+        # URC for new SMS: +CMTI: "SM_P",<index>, handled by _on_cmti
+        # (and +CDS status reports, handled by _on_status_report)
+        cnmi = CNMI_REPORTS if self.delivery_reports else CNMI_SETTING
+        self._ensure("cnmi", cnmi, f"AT+CNMI={cnmi}")
 
-    # ---------- LOW LEVEL AT ----------
+    # ---------- MODEM STATE ----------
 
-    def _send_at_command(self, command: str, delay: float = 0.3, timeout: float = 2.0) -> str:
+    def _ensure(self, key: str, value: Any, command: str) -> bool:
         """
-        Send an AT command and read back the response.
-        This avoids piling up junk in the serial buffer.
+        Send `command` only if the cached modem state for `key` is unknown or differs
+        from `value`. Returns False if the modem rejected the command.
         """
-        # Clear old data before sending a new command
-        self.ser.reset_input_buffer()
-        self.ser.write((command + "\r").encode())
+        with self._lock:
+            if key in self._modem_state and self._modem_state[key] == value:
+                return True
+            resp = self._send_at_command(command)
+            if resp.ok:
+                self._modem_state[key] = value
+            return resp.ok
 
-        # Give the modem a moment to respond
-        time.sleep(delay)
+    def _ensure_pdu_mode(self) -> bool:
+        return self._ensure("cmgf", 0, "AT+CMGF=0")
 
-        end_time = time.time() + timeout
-        resp_bytes = bytearray()
+    def _ensure_storage(self) -> bool:
+        return self._ensure("cpms", STORAGE, f'AT+CPMS="{STORAGE}","{STORAGE}","{STORAGE}"')
 
-        while time.time() < end_time:
-            chunk = self.ser.read(self.ser.in_waiting or 0)
-            if chunk:
-                resp_bytes.extend(chunk)
-            else:
-                # No data right now; wait a bit and check again
-                time.sleep(0.05)
+    def _invalidate_state(self) -> None:
+        self._modem_state.clear()
+        self._listed_used = None
+
+    def _on_reset(self, line: str) -> None:
+        print(f"[SMS] Modem reset detected ({line}), re-initializing")
+        self._invalidate_state()
+        self.scheduler.run(self._init_modem, priority=PRIORITY_SEND)
 
-        resp = resp_bytes.decode(errors="ignore")
-        # print(f">>> {command}\n{resp}")  # uncomment for debugging
+    # ---------- LOW LEVEL AT ----------
+
+    def _send_at_command(self, command: str, timeout: float = 2.0, expect_prompt: bool = False) -> ATResponse:
+        """
+        Send an AT command and read back the response.
+        Returns as soon as a final result code (or the '>' prompt, if expected) arrives;
+        `timeout` is only an upper bound.
+        """
+        resp = self._transact((command + "\r").encode(), command, timeout, expect_prompt)
+        # print(f">>> {command}\n{resp.raw}")  # uncomment for debugging
         return resp
 
-    @staticmethod
-    def _to_ucs2(text: str) -> str:
-        return "".join(f"{ord(c):04X}" for c in text)
+    def _transact(self, payload: bytes, command: str, timeout: float, expect_prompt: bool = False) -> ATResponse:
+        """
+        Write `payload` and wait for the reader thread to collect the response.
+        """
+        with self._lock:
+            pending = _PendingCommand(command, expect_prompt)
+            start = time.monotonic()
+            self._pending = pending
+            try:
+                self.ser.write(payload)
+                metrics.SERIAL_BYTES.inc("out", amount=len(payload))
+                pending.done.wait(timeout)
+            finally:
+                self._pending = None
+            resp = pending.response
+            resp.elapsed = time.monotonic() - start
+            _observe_command(resp)
+            if not resp.ok:
+                # After an error or timeout we can no longer trust what we think the modem is set to
+                self._invalidate_state()
+            return resp
+
+    def _stream_command(self, command: str, timeout: float, index: Optional[int] = None) -> Iterator[dict]:
+        """
+        Send a CMGL/CMGR command and yield each message as soon as the parser has
+        it, instead of waiting for the whole listing.
+        """
+        with self._lock:
+            pending = _PendingCommand(command, False, parser=ListingParser(_is_final_line, index=index))
+            start = time.monotonic()
+            deadline = start + timeout
+            self._pending = pending
+            try:
+                payload = (command + "\r").encode()
+                self.ser.write(payload)
+                metrics.SERIAL_BYTES.inc("out", amount=len(payload))
+                while True:
+                    try:
+                        yield pending.records.get(timeout=0.05)
+                        continue
+                    except queue.Empty:
+                        pass
+                    if pending.done.is_set() and pending.records.empty():
+                        break
+                    if time.monotonic() > deadline:
+                        break
+            finally:
+                self._pending = None
+            pending.response.elapsed = time.monotonic() - start
+            _observe_command(pending.response)
+            if not pending.response.ok:
+                self._invalidate_state()
+                print(f"[SMS] {command} ended with {pending.response.status}")
+
+    # ---------- SERIAL READER ----------
+
+    def _reader_loop(self) -> None:
+        """
+        Owns all reads from the serial port. Lines are routed either to the
+        command in flight or, for unsolicited result codes, to the URC queue.
+        """
+        buf = bytearray()
+        while not self._stop.is_set():
+            try:
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                print(f"[SMS Reader Error] {e}")
+                time.sleep(1)
+                continue
+            if not chunk:
+                continue
+            metrics.SERIAL_BYTES.inc("in", amount=len(chunk))
+
+            pending = self._pending
+            if pending is not None and pending.parser is not None and not pending.done.is_set():
+                # Streaming listing: hand raw bytes to its parser; only what follows the
+                # final result code comes back to the line router
+                self._feed_parser(pending, bytes(buf) + chunk)
+                buf.clear()
+                chunk = pending.parser.remainder
+                pending.parser.remainder = b""
+            buf.extend(chunk)
+
+            while True:
+                nl = buf.find(b"\n")
+                if nl < 0:
+                    break
+                line = buf[:nl].decode(errors="ignore").strip()
+                del buf[:nl + 1]
+                if line:
+                    self._route_line(line)
+
+            # The '>' prompt has no line ending, so it is detected on the partial buffer
+            pending = self._pending
+            if pending is not None and pending.expect_prompt and buf.strip() == PROMPT.encode():
+                buf.clear()
+                pending.response.status = PROMPT
+                pending.done.set()
+
+    def _feed_parser(self, pending: _PendingCommand, data: bytes) -> None:
+        for kind, item in pending.parser.feed(data):
+            if kind == "record":
+                pending.records.put(item)
+            elif kind == "final":
+                pending.response.status = item
+                pending.done.set()
+            else:
+                self._take_urc(item, pending.command)
 
-    @staticmethod
-    def _decode_ucs2_maybe(hex_str: str) -> str:
+    def _take_urc(self, line: str, command: Optional[str]) -> bool:
         """
-        Try to decode UCS2, fall back gracefully if the content is not valid hex/UCS2.
-        This reduces the "sometimes wrong encoding" issue.
+        Queue `line` for the URC thread if it is a URC, or the PDU line that
+        completes a +CDS. Returns True if the line was taken.
         """
-        # Short sanity check: even length and only hex chars
-        hs = hex_str.strip()
-        if len(hs) % 4 != 0:
-            # Might not be UCS2; just return as-is
-            return hs
+        if self._cds_header is not None:
+            self._urc_queue.put(f"{self._cds_header}\n{line}")
+            self._cds_header = None
+            return True
+        if not _is_urc(line, command):
+            return False
+        if line.startswith("+CDS:"):
+            self._cds_header = line  # +CDS: <length>, the PDU follows on its own line
+        else:
+            self._urc_queue.put(line)
+        return True
+
+    def _route_line(self, line: str) -> None:
+        pending = self._pending
+        if self._take_urc(line, pending.command if pending else None):
+            return
+        if pending is None or pending.done.is_set():
+            # Late or stray output with no command waiting for it
+            return
+        if line == pending.command:
+            # Command echo
+            return
+        if _is_final_line(line):
+            pending.response.status = line
+            pending.done.set()
+            return
+        pending.response.lines.append(line)
+
+    def _urc_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                line = self._urc_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            for prefix, handler in self._urc_handlers.items():
+                if line.startswith(prefix):
+                    try:
+                        handler(line)
+                    except Exception as e:
+                        print(f"[SMS URC Error] {line}: {e}")
+                    break
 
+    def _on_cmti(self, line: str) -> None:
+        """
+        +CMTI: "SM_P",<index> -> fetch just that message.
+        """
         try:
-            return bytes.fromhex(hs).decode("utf-16-be")
-        except Exception:
-            return hs
+            index = int(line.rsplit(",", 1)[1])
+        except (IndexError, ValueError):
+            return
+        self.read_message(index)
+
+    def _on_status_report(self, line: str) -> None:
+        """
+        +CDS: <length>\n<pdu> -> match it to its send; final outcomes go to the
+        report callback.
+        """
+        report = decode_status_report(line.split("\n", 1)[1])
+        metrics.DELIVERY_REPORTS.inc(report["outcome"])
+        outcome = self.deliveries.report(report)
+        if outcome is not None:
+            self._emit_report(outcome)
+
+    def _emit_report(self, outcome: dict) -> None:
+        if self.report_callback:
+            try:
+                self.report_callback(outcome)
+            except Exception as cb_err:
+                print(f"[SMS Report Callback Error] {cb_err}")
 
     # ---------- PUBLIC API ----------
 
@@ -89,54 +462,99 @@ class SMSHandler:
         Delete all SMS from current memory (SM_P).
         """
         try:
-            self._send_at_command("AT")
-            self._send_at_command("AT+CMGF=1")
-            resp = self._send_at_command("AT+CMGD=1,4", timeout=5.0)
-            ok = "OK" in resp and "ERROR" not in resp
-            return {"status": "cleared" if ok else "error", "raw_response": resp}
+            resp = self.scheduler.run(self._storage_command, "AT+CMGD=1,4", 25.0, priority=PRIORITY_MAINTENANCE)
+            self._forget_listing()
+            self._unpin_failed()
+            return {"status": "cleared" if resp.ok else "error", "raw_response": resp.raw}
         except Exception as e:
             return {"status": "error", "error": str(e)}
 
-    def send_sms(self, phone_number: str, message: str) -> Dict[str, Any]:
+    def send_sms(self, phone_number: str, message: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
-        Send an SMS with UCS2 so æ/ø/å works.
+        Send an SMS in PDU mode. GSM-7 is used when the text fits the default
+        alphabet (æ/ø/å do), UCS2 otherwise; long texts go out as concatenated parts.
+        Runs ahead of polls and maintenance; `deadline` is how many seconds it
+        may wait for the modem before giving up with status "expired".
         Returns a structured result so you can set Messages.isSent.
         """
+        start = time.monotonic()
         try:
-            self._send_at_command("AT")
-            self._send_at_command("AT+CMGF=1")
-            self._send_at_command('AT+CSCS="UCS2"')
-
-            ucs2_number = self._to_ucs2(phone_number)
-            ucs2_message = self._to_ucs2(message)
-
-            # Start CMGS (don't use _send_at_command here because we need the '>' prompt)
-            self.ser.reset_input_buffer()
-            self.ser.write((f'AT+CMGS="{ucs2_number}"\r').encode())
-            time.sleep(0.5)
-
-            # Send the message and Ctrl+Z
-            self.ser.write(ucs2_message.encode() + b"\x1A")
-            time.sleep(3)
-
-            # Read the modem's response to CMGS
-            resp = self.ser.read(self.ser.in_waiting or 1).decode(errors="ignore")
-
-            success = ("OK" in resp) and ("+CMS ERROR" not in resp)
+            result = self.scheduler.run(
+                self._send_pdus, phone_number, message, priority=PRIORITY_SEND, deadline=deadline
+            )
+        except DeadlineExceeded as e:
+            result = {"success": False, "status": "expired", "to": phone_number, "message": message, "error": str(e)}
+        metrics.SEND_LATENCY.observe(time.monotonic() - start)
+        cms_error = result.get("cms_error")
+        metrics.SEND_TOTAL.inc(result["status"], "" if cms_error is None else str(cms_error))
+        return result
+
+    def _send_pdus(self, phone_number: str, message: str) -> Dict[str, Any]:
+        tracked: Optional[dict] = None
+        pdus: List[Tuple[str, int]] = []
+        sent_parts = 0
+        try:
+            pdus = encode_message(phone_number, message, status_report=self.delivery_reports)
+            references: List[int] = []
+            # Each part is tracked as soon as its reference is known: its report
+            # can arrive while the next part is still being sent
+            if self.delivery_reports:
+                tracked = self.deliveries.begin(phone_number, len(pdus))
+            final: Optional[dict] = None
+
+            with self._lock:
+                if not self._ensure_pdu_mode():
+                    raise RuntimeError("modem rejected PDU mode")
+
+                for pdu, length in pdus:
+                    # Start CMGS and wait for the '>' prompt
+                    resp = self._send_at_command(f"AT+CMGS={length}", timeout=5.0, expect_prompt=True)
+                    if resp.status != PROMPT:
+                        # Abort any half-open CMGS so the next command is not eaten as message text
+                        self.ser.write(b"\x1B")
+                        metrics.SERIAL_BYTES.inc("out")
+                        break
+
+                    # Send the PDU and Ctrl+Z; the network can take a while to accept it
+                    resp = self._transact(pdu.encode() + b"\x1A", pdu, timeout=60.0)
+                    if not resp.ok:
+                        break
+                    sent_parts += 1
+                    reference = _message_reference(resp)
+                    if reference is not None:
+                        references.append(reference)
+                        if tracked is not None:
+                            final = self.deliveries.track(tracked, reference) or final
+
+            success = sent_parts == len(pdus)
+            if tracked is not None:
+                if not success or len(references) < sent_parts:
+                    # Retried as a whole, or a part can never be matched
+                    self.deliveries.abandon(tracked)
+                elif final is not None:
+                    self._emit_report(final)
             return {
                 "success": success,
                 "status": "sent" if success else "error",
                 "to": phone_number,
                 "message": message,
-                "raw_response": resp,
+                "parts": len(pdus),
+                "sent_parts": sent_parts,
+                "references": references,
+                "cms_error": resp.error_code,
+                "raw_response": resp.raw,
             }
         except Exception as e:
+            if tracked is not None:
+                self.deliveries.abandon(tracked)
             # For DB: isSent = False, store error message
             return {
                 "success": False,
                 "status": "exception",
                 "to": phone_number,
                 "message": message,
+                "parts": len(pdus),
+                "sent_parts": sent_parts,
                 "error": str(e),
             }
 
@@ -145,121 +563,281 @@ class SMSHandler:
         Read SMS messages from SIM.
         - If include_read=False: only REC UNREAD (your polling loop use-case).
         - If include_read=True: both REC UNREAD and REC READ (for maintenance, etc.)
+        Returns complete messages; segments of a long SMS are held back until the
+        last part arrives.
         """
+        return self.scheduler.run(self._read_sms, include_read, priority=PRIORITY_POLL)
+
+    def _read_sms(self, include_read: bool) -> List[dict]:
+        start = time.monotonic()
+        # Earlier failed handoffs first, so one just failing below is not retried at once
+        ready: List[dict] = self._retry_failed()
+        listed = 0
         try:
-            self._send_at_command("AT")
-            # We assume mode/charset/storage already set in _init_modem
-            box = '"REC UNREAD"' if not include_read else '"ALL"'
-            raw_data = self._send_at_command(f"AT+CMGL={box}", delay=1.0, timeout=3.0)
-            return self._parse_sms(raw_data)
+            # No-ops unless a reset or error made the cached modem state unknown
+            self._ensure_pdu_mode()
+            self._ensure_storage()
+            stat = PDU_STAT_ALL if include_read else PDU_STAT_UNREAD
+            # Each message reaches the callback as soon as it is parsed
+            for msg in self._stream_command(f"AT+CMGL={stat}", timeout=30.0):
+                listed += 1
+                self._seen_indexes.add(msg.get("index"))
+                ready.extend(self._deliver([msg]))
+            if not listed:
+                # Nothing new; still release long messages whose parts timed out
+                ready.extend(self._deliver([]))
+            return ready
         except Exception as e:
             print(f"[SMS Read Error] {e}")
-            return []
+            self._listed_used = None
+            return ready
+        finally:
+            metrics.POLL_LATENCY.observe(time.monotonic() - start)
+            metrics.POLL_MESSAGES.observe(listed)
 
-    def delete_read_messages(self) -> Dict[str, Any]:
+    def read_message(self, index: int) -> Optional[dict]:
         """
-        Delete messages with status REC READ from SIM.
-        Strategy:
-        1) List ALL messages.
-        2) Parse them, collect indexes with status == "REC READ".
-        3) AT+CMGD=<index> for each.
+        Read a single SMS by storage index (AT+CMGR). Used for +CMTI notifications.
+        The callback only fires if the message was still unread or no poll has
+        read that slot yet, so a poll that already picked it up does not deliver
+        it twice.
         """
-        try:
-            data = self._send_at_command('AT+CMGL="ALL"', delay=1.0, timeout=3.0)
-            messages = self._parse_sms(data)
+        return self.scheduler.run(self._read_message, index, priority=PRIORITY_POLL)
 
-            deleted = []
-            for msg in messages:
-                if msg.get("status") == "REC READ" and msg.get("index") is not None:
-                    idx = msg["index"]
-                    self._send_at_command(f"AT+CMGD={idx}", timeout=2.0)
-                    deleted.append(idx)
-
-            return {"status": "ok", "deleted_indexes": deleted}
+    def _read_message(self, index: int) -> Optional[dict]:
+        try:
+            self._ensure_pdu_mode()
+            self._ensure_storage()
+            messages = list(self._stream_command(f"AT+CMGR={index}", timeout=5.0, index=index))
+            if not messages:
+                return None
+            msg = messages[0]
+            # A slot no poll has read is new to us even if something else
+            # already marked it read
+            unseen = index not in self._seen_indexes
+            if unseen:
+                # One more slot used that the poller already knows about
+                self._seen_indexes.add(index)
+                if self._listed_used is not None:
+                    self._listed_used += 1
+            if unseen or msg["status"] == "REC UNREAD":
+                self._deliver([msg])
+            return msg
         except Exception as e:
-            return {"status": "error", "error": str(e)}
+            print(f"[SMS Read Error] {e}")
+            return None
 
-    # ---------- PARSER ----------
+    def storage_status(self) -> Dict[str, Any]:
+        """
+        Used/total message slots in the preferred storage, via AT+CPMS?.
+        +CPMS: "SM_P",<used>,<total>,"SM_P",<used>,<total>,...
+        """
+        resp = self.scheduler.run(self._storage_command, "AT+CPMS?", 2.0, priority=PRIORITY_POLL)
+        for line in resp.lines:
+            if line.startswith("+CPMS:"):
+                fields = [f.strip().strip('"') for f in line[len("+CPMS:"):].split(",")]
+                try:
+                    return {"storage": fields[0], "used": int(fields[1]), "total": int(fields[2])}
+                except (IndexError, ValueError):
+                    break
+        raise RuntimeError(f"unexpected CPMS response: {resp.raw}")
 
-    def _parse_sms(self, raw: str) -> List[dict]:
+    def delete_read_messages(self) -> Dict[str, Any]:
         """
-        Parse CMGL output with UCS2 phone/content.
+        Delete messages with status REC READ from SIM.
+        Strategy:
+        - If every read message has been handed off, one AT+CMGD=1,1 deletes them all.
+        - Otherwise (segments still waiting for their other parts, or a failed
+          callback) list REC READ and AT+CMGD=<index> only the handed-off ones.
+          Listing ALL would mark unread messages read without delivering them.
+        The listing and every delete are separate maintenance jobs, so sends
+        do not wait for the whole clean-up. Each delete job checks again what
+        must be kept, since a poll between the jobs can add to it.
         """
-        messages: List[dict] = []
-        lines = [line.strip() for line in raw.splitlines() if line.strip()]
-        i = 0
+        try:
+            resp = self.scheduler.run(self._delete_all_read, priority=PRIORITY_MAINTENANCE)
+            if resp is not None:
+                if not resp.ok:
+                    return {"status": "error", "raw_response": resp.raw}
+                return {"status": "ok", "mode": "bulk"}
 
-        while i < len(lines):
-            line = lines[i]
-            if line.startswith("+CMGL:"):
-                header = line[len("+CMGL:"):].strip()
-                parts = [p.strip() for p in header.split(",")]
+            messages = self.scheduler.run(self._list_storage, PDU_STAT_READ, priority=PRIORITY_MAINTENANCE)
 
-                if len(parts) < 5:
-                    i += 1
+            deleted, kept = [], []
+            for msg in messages:
+                idx = msg.get("index")
+                if msg.get("status") != "REC READ" or idx is None:
                     continue
+                result = self.scheduler.run(self._delete_read_index, idx, priority=PRIORITY_MAINTENANCE)
+                if result is None:
+                    kept.append(idx)
+                elif result:
+                    deleted.append(idx)
 
-                try:
-                    index = int(parts[0])
-                except ValueError:
-                    index = None
-
-                status = parts[1].strip('"')
-                raw_phone = parts[2].strip('"')
-                timestamp = parts[4].strip('"')
-
-                # Next line should be content; if next line is another +CMGL, we treat content as empty
-                raw_content = ""
-                if i + 1 < len(lines) and not lines[i + 1].startswith("+CMGL:"):
-                    raw_content = lines[i + 1]
-                    i += 2
-                else:
-                    i += 1
+            if deleted:
+                self._forget_listing()
+            return {"status": "ok", "mode": "indexed", "deleted_indexes": deleted, "kept_indexes": kept}
+        except Exception as e:
+            return {"status": "error", "error": str(e)}
 
-                phone = self._decode_ucs2_maybe(raw_phone)
-                content = self._decode_ucs2_maybe(raw_content)
+    def _keep_indexes(self) -> Set[int]:
+        # Slots a clean-up must not touch: segments waiting for their other parts, failed handoffs
+        return set(self._concat.pending_indexes()) | self._failed_indexes()
+
+    def _delete_all_read(self) -> Optional[ATResponse]:
+        # Check and delete in one job, so no poll can pin a message in between.
+        # None: something must be kept, delete by index instead.
+        if self._keep_indexes():
+            return None
+        # <delflag> 1: delete all read messages in one command
+        resp = self._storage_command("AT+CMGD=1,1", 25.0)
+        self._forget_listing()
+        return resp
 
-                msg = {
-                    "index": index,
-                    "status": status,       # "REC UNREAD" / "REC READ" etc.
-                    "phone": phone,
-                    "createdAt": timestamp,
-                    "content": content,
-                }
-                messages.append(msg)
+    def _delete_read_index(self, idx: int) -> Optional[bool]:
+        # None: the slot has to be kept; else whether the delete succeeded
+        if idx in self._keep_indexes():
+            return None
+        return self._storage_command(f"AT+CMGD={idx}", 5.0).ok
 
-                if self.callback:
-                    try:
-                        self.callback(msg)
-                    except Exception as cb_err:
-                        print(f"[SMS Callback Error] {cb_err}")
-            else:
-                i += 1
+    def _storage_command(self, command: str, timeout: float) -> ATResponse:
+        # No-ops unless a reset or error made the cached modem state unknown
+        self._ensure_pdu_mode()
+        self._ensure_storage()
+        return self._send_at_command(command, timeout=timeout)
 
-        return messages
+    def _list_storage(self, stat: int) -> List[dict]:
+        self._ensure_pdu_mode()
+        self._ensure_storage()
+        return list(self._stream_command(f"AT+CMGL={stat}", timeout=30.0))
 
     # ---------- CALLBACK & POLLER ----------
 
     def set_callback(self, callback_fn: Callable[[dict], None]):
         self.callback = callback_fn
 
-    def start_receiver_thread(self, interval: float = 5.0):
+    def set_report_callback(self, callback_fn: Callable[[dict], None]):
+        """Final delivery outcomes (see DeliveryTracker.report); needs delivery_reports=True."""
+        self.report_callback = callback_fn
+
+    def _deliver(self, messages: List[dict]) -> List[dict]:
+        """
+        Run decoded messages through the reassembly buffer and fire the callback
+        once per complete (or timed-out partial) message.
+        """
+        ready: List[dict] = []
+        for msg in messages:
+            msg["phone"] = phone_key(msg["phone"])  # Same sender, same key, however the modem formats it
+            ready.extend(self._concat.add(msg))
+        if not messages:
+            ready.extend(self._concat.expire())
+        if ready:
+            self._traffic.set()
+        for msg in ready:
+            msg.pop("concat", None)
+            if not self._notify(msg):
+                with self._failed_lock:
+                    self._failed.append(msg)
+        return ready
+
+    def _retry_failed(self) -> List[dict]:
+        """
+        Hand messages whose callback failed to the callback again. Returns the
+        ones it took; they are no longer kept on the SIM.
+        """
+        delivered: List[dict] = []
+        with self._failed_lock:
+            still_failing = []
+            for msg in self._failed:
+                (delivered if self._notify(msg) else still_failing).append(msg)
+            self._failed = still_failing
+        return delivered
+
+    def _failed_indexes(self) -> Set[int]:
+        with self._failed_lock:
+            return {
+                i for msg in self._failed for i in (msg.get("indexes") or [msg.get("index")]) if i is not None
+            }
+
+    def _unpin_failed(self) -> None:
+        # The SIM was wiped and its indexes will be reused: keep retrying, but pin nothing
+        with self._failed_lock:
+            for msg in self._failed:
+                msg["index"] = None
+                msg.pop("indexes", None)
+
+    def _notify(self, msg: dict) -> bool:
+        """
+        Hand a message to the callback. Returns False if the callback raised.
+        """
+        if self.callback:
+            try:
+                self.callback(msg)
+            except Exception as cb_err:
+                print(f"[SMS Callback Error] {cb_err}")
+                return False
+        return True
+
+    def _forget_listing(self) -> None:
+        # Messages were deleted: the storage count no longer says anything, list next time
+        self._listed_used = None
+        self._seen_indexes.clear()
+
+    def poll_sms(self) -> Dict[str, Any]:
         """
-        Poll every `interval` seconds for new (REC UNREAD) messages.
+        One receive poll for the background thread. A cheap AT+CPMS? probe
+        comes first; the AT+CMGL listing only runs when the used count differs
+        from what the last listing and the +CMTI reads since then account for.
+        Returns {"listed": bool, "messages": [...]}.
+        """
+        used = None
+        try:
+            # Probe and listing are separate jobs: a send can go out in between
+            used = self.storage_status()["used"]
+        except Exception as e:
+            print(f"[SMS Probe Error] {e}")  # Fall back to listing
+        if used is not None and used == self._listed_used:
+            metrics.POLL_PROBES.inc("unchanged")
+            # Nothing new; still retry failed handoffs and release long messages whose parts timed out
+            return {"listed": False, "messages": self._retry_failed() + self._deliver([])}
+        metrics.POLL_PROBES.inc("changed" if used is not None else "error")
+        # A listing that fails resets this to None again
+        self._listed_used = used
+        return {"listed": True, "messages": self.read_sms(include_read=False)}
+
+    def start_receiver_thread(
+        self,
+        min_interval: float = POLL_MIN_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        backoff: float = POLL_BACKOFF,
+    ):
+        """
+        Safety-net poll for new (REC UNREAD) messages. New messages normally
+        arrive through +CMTI (see _on_cmti); the poll only catches anything
+        whose notification was missed.
+        The interval starts at min_interval, grows by `backoff` after every
+        idle poll up to max_interval, and drops back to min_interval once
+        messages come in (by poll or +CMTI). Most polls are only an AT+CPMS?
+        probe, see poll_sms.
         Uses a background thread; does not block main program.
         """
 
         def _loop():
-            next_run = time.monotonic()
-            while True:
+            interval = min_interval
+            while not self._stop.is_set():
                 try:
-                    self.read_sms(include_read=False)
+                    self.poll_sms()
                 except Exception as e:
                     print(f"[SMS Receiver Error] {e}")
 
-                next_run += interval
-                sleep_time = max(0, next_run - time.monotonic())
-                time.sleep(sleep_time)
+                if self._traffic.is_set():
+                    self._traffic.clear()
+                    interval = min_interval
+                else:
+                    interval = min(interval * backoff, max_interval)
+                metrics.POLL_INTERVAL.set(interval)
+                # Traffic (+CMTI) cuts a long idle wait short
+                self._traffic.wait(interval)
 
         thread = threading.Thread(target=_loop, daemon=True)
         thread.start()
@@ -0,0 +1,85 @@
+import threading
+from typing import Any, Dict, Optional
+
+from sms import SMSHandler
+
+HIGH_WATERMARK = 0.6      # compact when this fraction of slots is used
+CHECK_INTERVAL = 120.0    # seconds between background storage checks
+
+
+class StorageManager:
+    """
+    Keeps the SIM message storage from filling up. When it is full the network
+    rejects new messages without telling us.
+    - tracks used/total slots via AT+CPMS?
+    - in the background, deletes handed-off (read) messages in bulk whenever
+      usage crosses `high_watermark`
+    """
+
+    def __init__(
+        self,
+        sms: SMSHandler,
+        high_watermark: float = HIGH_WATERMARK,
+        interval: float = CHECK_INTERVAL,
+    ):
+        self.sms = sms
+        self.high_watermark = high_watermark
+        self.interval = interval
+        self.used: Optional[int] = None
+        self.total: Optional[int] = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+    def refresh(self) -> Dict[str, Any]:
+        status = self.sms.storage_status()
+        self.used, self.total = status["used"], status["total"]
+        return status
+
+    @property
+    def usage(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return self.used / self.total
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Delete handed-off messages now and refresh the counters.
+        """
+        result = self.sms.delete_read_messages()
+        try:
+            result["storage"] = self.refresh()
+        except Exception as e:
+            print(f"[SMS Storage Error] {e}")
+        return result
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """
+        Compact if usage is at or above the high watermark. Returns the compaction
+        result, or None if nothing needed doing.
+        """
+        self.refresh()
+        usage = self.usage
+        if not self.used or usage is None or usage < self.high_watermark:
+            return None
+        print(f"[SMS Storage] {self.used}/{self.total} slots used, compacting")
+        return self.compact()
+
+    def notify(self) -> None:
+        """Ask for an early check, e.g. right after new messages arrived."""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        def _loop():
+            while not self._stop.is_set():
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"[SMS Storage Error] {e}")
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+
+        threading.Thread(target=_loop, name="sms-storage", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
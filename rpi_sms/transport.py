@@ -0,0 +1,241 @@
+"""
+Serial transports for SMSHandler: the real port, a recorder that captures
+every byte in both directions, and a replayer that plays a capture back as a
+fake serial port.
+
+A transport only needs what SMSHandler uses from pyserial: read(n),
+in_waiting, write(data) and close().
+
+Capture file format (little endian):
+  b"SMSCAP1\\n", start time (double, epoch seconds)
+  then one record per read/write: direction (b"T" to the modem, b"R" from it),
+  seconds since start (double), length (uint32), the bytes
+
+Inspect a capture:
+  python transport.py info capture.smscap
+  python transport.py dump capture.smscap
+"""
+import struct
+import sys
+import threading
+import time
+from typing import BinaryIO, Iterator, List, Tuple
+
+import serial
+
+MAGIC = b"SMSCAP1\n"
+_START = struct.Struct("<d")
+_RECORD = struct.Struct("<cdI")
+TX, RX = b"T", b"R"
+
+READ_TIMEOUT = 0.1  # same as the pyserial timeout SMSHandler uses
+
+
+def open_serial(port: str, baud: int) -> serial.Serial:
+    # Short read timeout: the response reader polls and enforces its own deadline.
+    return serial.Serial(port, baud, timeout=READ_TIMEOUT)
+
+
+def read_capture(path: str) -> Tuple[float, List[Tuple[bytes, float, bytes]]]:
+    """
+    Load a capture. Returns (start time, [(direction, offset, data), ...]).
+    A record cut short by a crash is dropped.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a serial capture")
+        (start,) = _START.unpack(f.read(_START.size))
+        records = []
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                break
+            direction, offset, length = _RECORD.unpack(head)
+            data = f.read(length)
+            if len(data) < length:
+                break
+            records.append((direction, offset, data))
+    return start, records
+
+
+def rx_bytes(path: str) -> bytes:
+    """Everything the modem sent in a capture, e.g. to benchmark the listing parser."""
+    return b"".join(data for direction, _, data in read_capture(path)[1] if direction == RX)
+
+
+class RecordingTransport:
+    """
+    Wraps a transport and appends every chunk read or written to a capture
+    file. Records are flushed as they are written, so a capture survives the
+    process being killed.
+    """
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(MAGIC + _START.pack(time.time()))
+        self._file.flush()
+
+    def _record(self, direction: bytes, data: bytes) -> None:
+        if not data:
+            return
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(_RECORD.pack(direction, time.monotonic() - self._start, len(data)) + data)
+            self._file.flush()
+
+    @property
+    def in_waiting(self) -> int:
+        return self.inner.in_waiting
+
+    def read(self, size: int = 1) -> bytes:
+        data = self.inner.read(size)
+        self._record(RX, data)
+        return data
+
+    def write(self, data: bytes) -> int:
+        self._record(TX, data)
+        return self.inner.write(data)
+
+    def close(self) -> None:
+        self.inner.close()
+        with self._lock:
+            self._file.close()
+
+    def __getattr__(self, name):
+        # Anything else (reset_input_buffer, is_open, ...) goes to the real port
+        return getattr(self.inner, name)
+
+
+class ReplayTransport:
+    """
+    Plays a capture back as a serial port, deterministically: what the modem
+    sent after a command is only released once the driver has written that
+    command, however fast or slow the driver is. Bytes the modem sent
+    unprompted (URCs) come out in their original place in the stream.
+
+    - realtime=False replays as fast as the driver reads (benchmarks)
+    - realtime=True keeps the captured gaps between modem chunks
+    Written bytes that differ from the capture are counted in `mismatches`;
+    the replay carries on with the captured stream.
+    """
+
+    def __init__(self, path: str, realtime: bool = False, timeout: float = READ_TIMEOUT):
+        _, self.records = read_capture(path)
+        self.realtime = realtime
+        self.timeout = timeout
+        self.mismatches = 0
+        self.is_open = True
+        self._pos = 0
+        self._partial = b""     # rest of an RX record a short read did not take
+        self._tx = b""          # written bytes not yet matched against TX records
+        self._cond = threading.Condition()
+        self._clock = time.monotonic()
+        self._last_offset = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self._pos >= len(self.records) and not self._partial
+
+    @property
+    def in_waiting(self) -> int:
+        with self._cond:
+            if self._partial:
+                return len(self._partial)
+            if self._pos < len(self.records) and self.records[self._pos][0] == RX:
+                return len(self.records[self._pos][2])
+            return 0
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._partial:
+                if not self.is_open:
+                    raise serial.SerialException("replay transport closed")
+                if self._pos < len(self.records) and self.records[self._pos][0] == RX:
+                    _, offset, data = self.records[self._pos]
+                    self._pos += 1
+                    if self.realtime:
+                        self._pace(offset)
+                    self._partial = data
+                    break
+                # Waiting for the driver to write the next command (or end of capture)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return b""
+                self._cond.wait(remaining)
+            data, self._partial = self._partial[:size], self._partial[size:]
+            return data
+
+    def _pace(self, offset: float) -> None:
+        gap = offset - self._last_offset
+        self._last_offset = offset
+        wait = self._clock + gap - time.monotonic()
+        if wait > 0:
+            self._cond.wait(wait)
+        self._clock = time.monotonic()
+
+    def write(self, data: bytes) -> int:
+        with self._cond:
+            self._tx += data
+            while self._tx and self._pos < len(self.records) and self.records[self._pos][0] == TX:
+                _, offset, expected = self.records[self._pos]
+                n = min(len(expected), len(self._tx))
+                if self._tx[:n] != expected[:n]:
+                    self.mismatches += 1
+                    print(f"[Replay] wrote {self._tx!r}, capture has {expected!r}")
+                    self._tx = b""
+                elif n < len(expected):
+                    # Driver wrote part of this record so far
+                    self.records[self._pos] = (TX, offset, expected[n:])
+                    self._tx = b""
+                    break
+                else:
+                    self._tx = self._tx[n:]
+                self._pos += 1
+                self._last_offset = offset
+                self._clock = time.monotonic()
+            if self._tx and (self._pos >= len(self.records) or self.records[self._pos][0] == RX):
+                # Nothing in the capture to match against here
+                self.mismatches += 1
+                print(f"[Replay] unexpected write {self._tx!r}")
+                self._tx = b""
+            self._cond.notify_all()
+        return len(data)
+
+    def close(self) -> None:
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+
+# ---------- CLI ----------
+
+def _transcript(records) -> Iterator[str]:
+    for direction, offset, data in records:
+        arrow = ">>" if direction == TX else "<<"
+        yield f"{offset:10.3f} {arrow} {data!r}"
+
+
+def main() -> None:
+    if len(sys.argv) != 3 or sys.argv[1] not in ("info", "dump"):
+        print("usage: python transport.py info|dump <capture>")
+        sys.exit(2)
+    start, records = read_capture(sys.argv[2])
+    if sys.argv[1] == "dump":
+        for line in _transcript(records):
+            print(line)
+        return
+    tx = sum(len(d) for k, _, d in records if k == TX)
+    rx = sum(len(d) for k, _, d in records if k == RX)
+    duration = records[-1][1] if records else 0.0
+    print(f"started {time.strftime('%F %T', time.localtime(start))}, {duration:.1f} s")
+    print(f"{len(records)} records, {tx} bytes to the modem, {rx} bytes from it")
+
+
+if __name__ == "__main__":
+    main()
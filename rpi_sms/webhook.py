@@ -1,16 +1,148 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from phone import phone_key
+
 WEBHOOK_URL = "http://192.168.1.191:3000/api/receive-sms-webhook"
+OUTBOX_DIR = "webhook_outbox"
+
+BACKOFF_BASE = 1.0    # seconds after the first failure, doubled per consecutive failure
+BACKOFF_MAX = 300.0
+
+
+class WebhookDispatcher:
+    """
+    Delivers webhook payloads from its own thread so the serial side never waits
+    on the network.
+    - enqueue() writes the payload to an on-disk outbox and returns immediately
+    - the worker posts outbox entries oldest first over a pooled keep-alive session
+    - while the endpoint is down (the Mac is asleep) it retries with exponential
+      backoff; once a post succeeds it drains the backlog back to back
+    Payloads rejected with a 4xx (other than 408/429) are moved to failed/.
+    """
+
+    def __init__(self, url: str = WEBHOOK_URL, outbox_dir: str = OUTBOX_DIR, timeout: float = 5.0):
+        self.url = url
+        self.outbox_dir = outbox_dir
+        self.failed_dir = os.path.join(outbox_dir, "failed")
+        self.timeout = timeout
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._failures = 0
+
+    # ---------- OUTBOX ----------
+
+    def enqueue(self, payload: dict) -> str:
+        """
+        Persist `payload` and wake the worker. File names sort in arrival order.
+        "phone" is sent as its canonical key (see phone.py).
+        """
+        if isinstance(payload.get("phone"), str):
+            payload = {**payload, "phone": phone_key(payload["phone"])}
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json"
+        tmp = os.path.join(self.outbox_dir, name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        # Atomic rename: the worker never sees a half-written file
+        os.replace(tmp, os.path.join(self.outbox_dir, name))
+        self._wakeup.set()
+        return name
+
+    def pending(self) -> int:
+        return len(self._outbox())
+
+    def _outbox(self):
+        return sorted(n for n in os.listdir(self.outbox_dir) if n.endswith(".json"))
+
+    # ---------- DELIVERY ----------
+
+    def _post(self, name: str) -> Optional[bool]:
+        """
+        Try one outbox entry. True: delivered, False: retry later, None: rejected for good.
+        """
+        path = os.path.join(self.outbox_dir, name)
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        start = time.monotonic()
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            metrics.WEBHOOK_LATENCY.observe(time.monotonic() - start)
+            metrics.WEBHOOK_TOTAL.inc("retry")
+            print(f"[Webhook Error] Could not notify Next.js: {e}")
+            return False
+        metrics.WEBHOOK_LATENCY.observe(time.monotonic() - start)
+
+        if response.ok:
+            metrics.WEBHOOK_TOTAL.inc("delivered")
+            os.remove(path)
+            return True
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            metrics.WEBHOOK_TOTAL.inc("rejected")
+            print(f"[Webhook Error] Rejected with HTTP {response.status_code}, moving {name} to failed/")
+            os.replace(path, os.path.join(self.failed_dir, name))
+            return None
+        metrics.WEBHOOK_TOTAL.inc("retry")
+        print(f"[Webhook Error] HTTP {response.status_code} from Next.js")
+        return False
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            delivered_all = True
+            for name in self._outbox():
+                if self._stop.is_set():
+                    return
+                if self._post(name) is False:
+                    delivered_all = False
+                    break
+                self._failures = 0
+
+            if delivered_all:
+                # Idle until something new is enqueued
+                self._wakeup.wait()
+            else:
+                self._failures += 1
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (self._failures - 1)))
+                # A new message also wakes us: it is a cheap probe whether the endpoint is back
+                self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        threading.Thread(target=self._worker, name="webhook", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+
+
+dispatcher = WebhookDispatcher()
+
 
 def notify_webhook(message_data: dict):
+    """
+    Queue `message_data` for delivery; returns without touching the network.
+    """
     try:
-        response = requests.post(
-            WEBHOOK_URL,
-            json=message_data,
-            timeout=5,
-        )
-        response.raise_for_status()
+        dispatcher.enqueue(message_data)
     except Exception as e:
-        print(f"[Webhook Error] Could not notify Next.js: {e}")
+        print(f"[Webhook Error] Could not queue message: {e}")
+
 
 def handle_incoming_sms(sms_data: dict):
     """
@@ -24,5 +156,5 @@ def handle_incoming_sms(sms_data: dict):
     print(f"From: {sms_data['phone']}")
     print(f"Message: {sms_data['content']}")
 
-    # Notify the webhook
+    # Notify the webhook (delivered by the dispatcher thread)
     notify_webhook(sms_data)
@@ -1,5 +1,5 @@
 # init the database
-from models import db, Contacts, Message
+from models import db, Contacts, canonicalize_contacts, iter_messages, upgrade_schema
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
@@ -11,19 +11,23 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False # Disable track modificatio
 db.init_app(app)
 with app.app_context():
     db.create_all()  # Create the database tables if they don't exist
+    upgrade_schema()  # Add content_hash and the indexes to a database from before they existed
+    canonicalize_contacts()  # One contact per number, stored in E.164 form
     
 
 def show_data():
-    contacts = Contacts.query.all()
-    messages = Message.query.all()
+    # Contacts are few; messages are streamed page by page instead of .query.all()
+    contacts = Contacts.query.order_by(Contacts.id).all()
+    names = {contact.id: contact.name for contact in contacts}
     
     print("Contacts:")
     for contact in contacts:
         print(contact)
     
     print("\nMessages:")
-    for message in messages:
-        print(message)
+    for message in iter_messages():
+        # Names from the map above: message.sender would lazy-load a contact per row
+        print(f"<Message {message.id} from {names[message.sender_id]} to {names[message.receiver_id]}>")
         
 if __name__ == "__main__":
     with app.app_context():
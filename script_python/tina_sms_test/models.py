@@ -1,7 +1,40 @@
+import hashlib
+import os
+import sqlite3
+import sys
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, or_, select, text, tuple_
+from sqlalchemy.engine import Engine
+
+# Number normalization is shared with the Pi's SMS service: rpi_sms/phone.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "rpi_sms")))
+from phone import phone_key
 
 db = SQLAlchemy()
 casc_option = "all, delete-orphan"
+PAGE_SIZE = 500  # rows per query when streaming history
+
+
+# SQLite tuning, applied to every new connection: WAL lets the ingest writer and
+# readers run at the same time instead of blocking each other
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")   # safe with WAL, far fewer fsyncs
+    cursor.execute("PRAGMA busy_timeout=5000")    # wait for a writer instead of failing
+    cursor.execute("PRAGMA cache_size=-8000")     # 8 MB page cache
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def message_hash(sender_phone, receiver_phone, timestamp, content):
+    # Natural key of a message, independent of row ids
+    key = "\x1f".join((sender_phone, receiver_phone, timestamp.isoformat(), content))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
 
 # this is for a sms app so the user will have contacts and messages that are from and to Contacts
 class Contacts(db.Model):
@@ -9,9 +42,10 @@ class Contacts(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, default='Contact') # Name of the contact
     phone_number = db.Column(db.String(15), unique=True, nullable=False)
-    messages_sent = db.relationship('Message', backref='sender', lazy='dynamic', cascade=casc_option)
-    messages_received = db.relationship('Message', backref='receiver', lazy='dynamic', cascade=casc_option)
-    
+    # Two foreign keys point at contacts, so each relationship names its own
+    messages_sent = db.relationship('Message', backref='sender', lazy='dynamic', cascade=casc_option, foreign_keys='Message.sender_id')
+    messages_received = db.relationship('Message', backref='receiver', lazy='dynamic', cascade=casc_option, foreign_keys='Message.receiver_id')
+
     def __repr__(self):
         return f'<Contact {self.name} - {self.phone_number}>'
 
@@ -22,6 +56,123 @@ class Message(db.Model):
     timestamp = db.Column(db.DateTime, nullable=False)
     sender_id = db.Column(db.Integer, db.ForeignKey('contacts.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('contacts.id'), nullable=False)
+    # message_hash() of the message; inserting the same message twice is a no-op
+    content_hash = db.Column(db.String(64), nullable=False)
+
+    __table_args__ = (
+        # Conversation history in time order, from either side, straight off the index
+        db.Index('ix_messages_sender_timestamp', 'sender_id', 'timestamp', 'id'),
+        db.Index('ix_messages_receiver_timestamp', 'receiver_id', 'timestamp', 'id'),
+        db.Index('ix_messages_content_hash', 'content_hash', unique=True),
+    )
 
     def __repr__(self):
-        return f'<Message {self.id} from {self.sender.name} to {self.receiver.name}>'
\ No newline at end of file
+        return f'<Message {self.id} from {self.sender.name} to {self.receiver.name}>'
+
+
+def upgrade_schema():
+    # create_all() does not touch existing tables: add the hash column and indexes to an older database
+    columns = {c["name"] for c in inspect(db.engine).get_columns("messages")}
+    if "content_hash" in columns:
+        return
+    db.session.execute(text("ALTER TABLE messages ADD COLUMN content_hash VARCHAR(64)"))
+    _rehash_messages()
+    db.session.commit()
+    for index in Message.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def _rehash_messages():
+    # Recompute every content_hash from the current contact numbers, then drop duplicates
+    phones = dict(db.session.execute(select(Contacts.id, Contacts.phone_number)).all())
+    rows = db.session.execute(select(Message.id, Message.sender_id, Message.receiver_id, Message.timestamp, Message.content))
+    updates = [
+        {"row_id": r.id, "h": message_hash(phones[r.sender_id], phones[r.receiver_id], r.timestamp, r.content)}
+        for r in rows
+    ]
+    if not updates:
+        return
+    db.session.execute(
+        Message.__table__.update().where(Message.id == db.bindparam("row_id")).values(content_hash=db.bindparam("h")),
+        updates,
+    )
+    # The same message stored twice (older imports, merged contacts); keep the first copy
+    db.session.execute(text(
+        "DELETE FROM messages WHERE id NOT IN (SELECT MIN(id) FROM messages GROUP BY content_hash)"
+    ))
+
+
+def canonicalize_contacts():
+    """
+    Rewrite contact numbers to their phone_key() form. Contacts that turn out
+    to be the same number are merged into the oldest one, their messages
+    moved over. Returns the number of contacts merged away.
+    """
+    keep = {}    # canonical number -> id of the contact that keeps it
+    merge = {}   # id -> id it is merged into
+    rename = {}  # id -> canonical number
+    for contact_id, number in db.session.execute(select(Contacts.id, Contacts.phone_number).order_by(Contacts.id)):
+        key = phone_key(number)
+        if key in keep:
+            merge[contact_id] = keep[key]
+        else:
+            keep[key] = contact_id
+            if key != number:
+                rename[contact_id] = key
+    if not merge and not rename:
+        return 0
+
+    messages = Message.__table__
+    # The unique hash index would reject rows that only become duplicates halfway through
+    db.session.execute(text("DROP INDEX IF EXISTS ix_messages_content_hash"))
+    for old_id, new_id in merge.items():
+        db.session.execute(messages.update().where(messages.c.sender_id == old_id).values(sender_id=new_id))
+        db.session.execute(messages.update().where(messages.c.receiver_id == old_id).values(receiver_id=new_id))
+    if merge:
+        db.session.execute(Contacts.__table__.delete().where(Contacts.id.in_(merge)))
+    for contact_id, number in rename.items():
+        db.session.execute(Contacts.__table__.update().where(Contacts.id == contact_id).values(phone_number=number))
+    _rehash_messages()
+    db.session.commit()
+    for index in Message.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    return len(merge)
+
+
+def iter_messages(page_size=PAGE_SIZE):
+    """
+    Every message in id order, one page per query (keyset on id), so the whole
+    table is never held in memory.
+    """
+    last_id = 0
+    while True:
+        page = db.session.execute(
+            select(Message).where(Message.id > last_id).order_by(Message.id).limit(page_size)
+        ).scalars().all()
+        yield from page
+        if len(page) < page_size:
+            return
+        last_id = page[-1].id
+
+
+def iter_conversation(contact_a_id, contact_b_id, after=None, page_size=PAGE_SIZE):
+    """
+    Messages between two contacts in time order, page by page. `after` is a
+    (timestamp, id) cursor, e.g. from the last message of a previous call;
+    each page is a range scan on the sender/receiver indexes.
+    """
+    between = or_(
+        (Message.sender_id == contact_a_id) & (Message.receiver_id == contact_b_id),
+        (Message.sender_id == contact_b_id) & (Message.receiver_id == contact_a_id),
+    )
+    while True:
+        query = select(Message).where(between)
+        if after is not None:
+            query = query.where(tuple_(Message.timestamp, Message.id) > tuple_(*after))
+        page = db.session.execute(
+            query.order_by(Message.timestamp, Message.id).limit(page_size)
+        ).scalars().all()
+        yield from page
+        if len(page) < page_size:
+            return
+        after = (page[-1].timestamp, page[-1].id)
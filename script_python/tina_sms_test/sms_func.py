@@ -72,11 +72,13 @@ def receive_sms():
     return messages
 
 
-try:
-    messages = receive_sms()
-    for msg in messages:
-        print(f"From: {msg['phone_number']}, Time: {msg['time']}, Message: {msg['content']}")
-finally:
-    ser.close()
+if __name__ == "__main__":
+    # Only when run directly: importing (sort_sms) must not read and close the port
+    try:
+        messages = receive_sms()
+        for msg in messages:
+            print(f"From: {msg['phone_number']}, Time: {msg['time']}, Message: {msg['content']}")
+    finally:
+        ser.close()
 
 
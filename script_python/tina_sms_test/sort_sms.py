@@ -1,6 +1,10 @@
 # This is a script that when run will sort the SMS messages in the database and add the contacts to the database if they do not already exist.
+import os
+from datetime import datetime
+from sqlalchemy import insert, select
 from sms_func import receive_sms
-from models import db, Contacts, Message
+from models import db, Contacts, Message, message_hash
+from phone import phone_key  # rpi_sms/phone.py, put on sys.path by models
 
 # This is the output of the receive_sms function, which retrieves SMS messages from the module.
 """
@@ -21,35 +25,125 @@ Tilbagebesked uden kontekst
 OK
 """
 
+# The SIM in the Pi: receiver of every message read from the module.
+# Required (e.g. SMS_OWN_NUMBER=+4512345678); there is no sensible default.
+OWN_NUMBER = os.environ.get("SMS_OWN_NUMBER", "").strip()
+BATCH_SIZE = 500  # messages per transaction
+MAX_VARS = 900    # stay below SQLite's bound-parameter limit in IN (...) lists
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _parse_timestamp(value):
+    # Modem format "24/10/30,18:31:31+04"; the timezone quarter-hours are dropped
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(value[:17], "%y/%m/%d,%H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+def _own_number():
+    if not OWN_NUMBER:
+        raise RuntimeError(
+            "SMS_OWN_NUMBER is not set: export the phone number of the SIM in the Pi, "
+            "it is stored as the receiver of every message read from the module"
+        )
+    return OWN_NUMBER
+
+
+def _normalize(message):
+    # receive_sms() gives phone_number/time/content; other importers may pass sender/receiver/timestamp
+    # Numbers become their canonical key, so "52228856" and "+4552228856" are one contact
+    sender = message.get("sender") or message.get("phone_number")
+    receiver = phone_key(message.get("receiver") or _own_number())
+    timestamp = _parse_timestamp(message.get("timestamp") or message.get("time"))
+    content = message.get("content")
+    if not sender or timestamp is None or content is None:
+        return None
+    return phone_key(sender), receiver, timestamp, content
+
+
+def _load_contacts(phones, contact_ids):
+    # Add phone -> id for every phone not yet in `contact_ids`, one query per MAX_VARS phones
+    for chunk in _chunks(sorted(phones - contact_ids.keys()), MAX_VARS):
+        rows = db.session.execute(
+            select(Contacts.phone_number, Contacts.id).where(Contacts.phone_number.in_(chunk))
+        )
+        contact_ids.update(rows.all())
+
+
+def _ensure_contacts(phones, contact_ids):
+    # Returns how many contacts had to be created
+    _load_contacts(phones, contact_ids)
+    missing = sorted(phones - contact_ids.keys())
+    if missing:
+        db.session.execute(insert(Contacts), [{"name": f"Contact {p}", "phone_number": p} for p in missing])
+        _load_contacts(set(missing), contact_ids)
+    return len(missing)
+
+
+def _existing_hashes(hashes):
+    # Content hashes already stored, in one indexed IN query per MAX_VARS hashes
+    found = set()
+    for chunk in _chunks(hashes, MAX_VARS):
+        found.update(db.session.execute(select(Message.content_hash).where(Message.content_hash.in_(chunk))).scalars())
+    return found
+
+
+def ingest_messages(messages, batch_size=BATCH_SIZE):
+    """
+    Store messages (and any new contacts) in bulk. Per batch: one or two
+    contact lookups, at most one contact insert, one dedup query and one
+    message insert, instead of three queries per message.
+    Messages already stored (same sender, receiver, timestamp and content,
+    i.e. the same content_hash) are skipped, also within the input itself;
+    the insert ignores any that another writer stored in the meantime.
+    """
+    stats = {"received": len(messages), "inserted": 0, "duplicates": 0, "skipped": 0, "contacts_created": 0}
+    normalized = [_normalize(m) for m in messages]
+    stats["skipped"] = sum(1 for n in normalized if n is None)
+
+    contact_ids = {}
+    for batch in _chunks([n for n in normalized if n is not None], batch_size):
+        phones = {sender for sender, _, _, _ in batch} | {receiver for _, receiver, _, _ in batch}
+        stats["contacts_created"] += _ensure_contacts(phones, contact_ids)
+
+        rows = [
+            {
+                "sender_id": contact_ids[sender],
+                "receiver_id": contact_ids[receiver],
+                "timestamp": timestamp,
+                "content": content,
+                "content_hash": message_hash(sender, receiver, timestamp, content),
+            }
+            for sender, receiver, timestamp, content in batch
+        ]
+        seen = _existing_hashes([row["content_hash"] for row in rows])
+        new_rows = []
+        for row in rows:
+            if row["content_hash"] in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(row["content_hash"])
+            new_rows.append(row)
+
+        if new_rows:
+            db.session.execute(insert(Message).prefix_with("OR IGNORE"), new_rows)
+        db.session.commit()
+        stats["inserted"] += len(new_rows)
+    return stats
+
+
 def sort_sms():
     messages = receive_sms()
-    for message in messages:
-        sender_phone = message['sender']
-        receiver_phone = message['receiver']
-        content = message['content']
-        timestamp = message['timestamp']
-
-        # Ensure sender contact exists
-        sender_contact = Contacts.query.filter_by(phone_number=sender_phone).first()
-        if not sender_contact:
-            sender_contact = Contacts(name=f"Contact {sender_phone}", phone_number=sender_phone)
-            db.session.add(sender_contact)
-
-        # Ensure receiver contact exists
-        receiver_contact = Contacts.query.filter_by(phone_number=receiver_phone).first()
-        if not receiver_contact:
-            receiver_contact = Contacts(name=f"Contact {receiver_phone}", phone_number=receiver_phone)
-            db.session.add(receiver_contact)
-
-        # Create and add the message
-        # if the message is not already in the database
-        existing_message = Message.query.filter_by(content=content, timestamp=timestamp, sender=sender_contact, receiver=receiver_contact).first()
-        if not existing_message:
-            new_message = Message(content=content, timestamp=timestamp, sender=sender_contact, receiver=receiver_contact)
-            continue
-        
-            db.session.add(new_message)
-
-    db.session.commit()
-    print("SMS messages sorted and contacts added to the database.")
-    
\ No newline at end of file
+    stats = ingest_messages(messages)
+    print(
+        f"SMS messages sorted: {stats['inserted']} added, {stats['duplicates']} already stored, "
+        f"{stats['skipped']} unreadable, {stats['contacts_created']} new contacts."
+    )
@@ -4,9 +4,43 @@ import { receiveMessage } from "@/app/actions"
 
 
 
+// The Pi posts delivery reports for sent messages to this same URL; they are not new SMS
+async function handleDeliveryReport(body: { phone: string; content: string; status: string }) {
+  const contact = await prisma.contact.findFirst({
+    where: { phone: body.phone },
+  })
+  // Latest sent message with that text to that contact that has no outcome yet
+  const message =
+    contact &&
+    (await prisma.message.findFirst({
+      where: {
+        contactId: contact.id,
+        direction: "OUTGOING",
+        content: body.content,
+        deliveryStatus: null,
+      },
+      orderBy: { createdAt: "desc" },
+    }))
+
+  if (!message) {
+    console.log("[Webhook] Delivery report without a matching message:", body)
+    return NextResponse.json({ success: true, matched: false }, { status: 200 })
+  }
+
+  await prisma.message.update({
+    where: { id: message.id },
+    data: { isSent: true, deliveryStatus: body.status },
+  })
+  return NextResponse.json({ success: true, matched: true }, { status: 200 })
+}
+
 export async function POST(req: NextRequest) {
   try {
     const body = await req.json()
+    if (body.type === "delivery_report") {
+      console.log("[Webhook] Delivery report:", body)
+      return await handleDeliveryReport(body)
+    }
     console.log("[Webhook] Incoming SMS:", body)
 
     const existingContact = await prisma.contact.findFirst({